@@ -0,0 +1,83 @@
+"""
+Compares the filtering engines (see `hybrid_face.filters.Filter`) on large images.
+
+For every image size and emphasis, the low-pass and high-pass branches of a hybrid image are timed with each engine
+and compared to the exact fft result. Errors are measured away from the borders, which the fft engine zero-pads while
+the pyramid engine reflects them. Run with `python benchmarks/benchmark_engines.py -h` for the options.
+"""
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+from PIL import Image
+from rich.table import Table
+
+from hybrid_face import console
+from hybrid_face.cli import sigma_dict
+from hybrid_face.filters import Filter, HighPassFilter, LowPassFilter
+
+
+def best_time(function: Callable[[], np.ndarray], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def load_image_data(image_path: str, side: int) -> np.ndarray:
+    # photos are more representative than noise since most of their energy is in the low frequencies
+    image = Image.open(image_path).convert("L")
+    return np.asarray(image.resize((side, side * image.size[1] // image.size[0]), Image.BICUBIC), dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", default="examples/guido-turing.png", help="image that is scaled to each size")
+    parser.add_argument("--sides", type=int, nargs="+", default=[1000, 2000, 4000], help="image widths in pixels")
+    parser.add_argument("--engines", nargs="+", default=list(Filter.engines), choices=Filter.engines)
+    parser.add_argument("--repeat", type=int, default=3, help="the best of this many runs is reported")
+    args = parser.parse_args()
+
+    table = Table(title="Hybrid image branches (low-pass + high-pass) per engine")
+    for column in ("size", "emphasis", "engine", "seconds", "speed-up", "mean |error|", "max |error|"):
+        table.add_column(column, justify="right")
+
+    for side in args.sides:
+        image_data = load_image_data(args.image, side)
+
+        for emphasis, sigma in sigma_dict.items():
+            exact_result = None
+            fft_seconds = None
+            margin = LowPassFilter(sigma).spatial_support()
+
+            for engine in ["fft"] + [engine for engine in args.engines if engine != "fft"]:
+                filters = (LowPassFilter(sigma, engine=engine), HighPassFilter(sigma, engine=engine))
+
+                def hybrid_branches() -> np.ndarray:
+                    return np.stack([image_filter.filter(image_data) for image_filter in filters])
+
+                seconds = best_time(hybrid_branches, args.repeat)
+                result = hybrid_branches()
+
+                if exact_result is None:
+                    exact_result, fft_seconds = result, seconds
+
+                error = np.abs(result - exact_result)[:, margin:-margin, margin:-margin]
+                table.add_row(
+                    f"{image_data.shape[1]} x {image_data.shape[0]}",
+                    emphasis,
+                    engine,
+                    f"{seconds:.3f}",
+                    f"{fft_seconds / seconds:.1f}x",
+                    f"{error.mean():.3f}",
+                    f"{error.max():.1f}",
+                )
+
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import CancelledError, Executor, Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional, TypeVar, Union
+
+import numpy as np
+from PIL import Image
+
+from hybrid_face.filters import Filter
+from hybrid_face.hybrid_merge import hybrid_merge
+
+T = TypeVar("T")
+
+# default cap on the number of blocking calls running at once, can be overwritten via environment variable
+MAX_CONCURRENCY = int(os.environ.get("HYBRID_FACE_MAX_CONCURRENCY", 0)) or os.cpu_count() or 1
+
+
+class StepExecutor(Executor):
+    """
+    Executor passed to `hybrid_merge` to run the tasks of its pipeline steps (face detection, filtering), either in
+    the calling thread or on `executor`. Once cancelled, it refuses to start further tasks, so the merge is aborted
+    with a `CancelledError` between two steps rather than running to completion.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self.executor = executor
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """Aborts the merge at its next step."""
+        self.cancelled.set()
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        if self.cancelled.is_set():
+            raise CancelledError("hybrid merge was cancelled")
+
+        if self.executor is not None:
+            return self.executor.submit(fn, *args, **kwargs)
+
+        future: "Future[T]" = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+def _hybrid_merge_steps(steps: StepExecutor, image1: Image, image2: Image, *args, **kwargs):
+    if kwargs.pop("concurrent", False) and steps.executor is None:
+        # same as `hybrid_merge`, but the thread pool has to be wrapped to keep the step checks
+        with ThreadPoolExecutor(max_workers=2) as steps.executor:
+            return hybrid_merge(image1, image2, *args, executor=steps, **kwargs)
+
+    return hybrid_merge(image1, image2, *args, executor=steps, **kwargs)
+
+
+class AsyncRunner:
+    """
+    Runs the blocking, CPU heavy calls of hybrid_face on `executor` so they can be awaited from an event loop, e.g. in
+    a web service. At most `max_concurrency` calls run at once, further calls wait without occupying a worker.
+
+    Spinners are only shown by the main thread, so calls running on the executor print log lines at most. Set
+    `hybrid_face.console.quiet` to silence them as well.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, max_concurrency: int = MAX_CONCURRENCY):
+        """
+        Args:
+            executor (Executor, optional): Thread executor to run the calls on. Defaults to None, i.e. the default
+                executor of the event loop.
+            max_concurrency (int, optional): Maximal number of calls running at once. Defaults to the
+                HYBRID_FACE_MAX_CONCURRENCY environment variable or one per CPU.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1. Got {max_concurrency}")
+
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+
+        # semaphores are bound to the event loop they are first used in
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        """Awaits `function(*args, **kwargs)` on the executor, once fewer than `max_concurrency` calls are running.
+
+        Note that a running call cannot be interrupted, cancelling only stops waiting for its result. The call keeps
+        its slot until it has actually finished, so cancellations cannot push the load past `max_concurrency`.
+        """
+        semaphore = self._semaphore()
+        await semaphore.acquire()
+
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(future: asyncio.Future):
+            semaphore.release()
+            # nobody awaits the result of cancelled calls, retrieve their exceptions so they are not reported
+            if not future.cancelled():
+                future.exception()
+
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    async def hybrid_merge(self, image1: Image, image2: Image, *args, **kwargs) -> Union[Image, List[Image]]:
+        """Awaitable `hybrid_merge`, takes the same arguments. Cancelling the awaiting task aborts the merge before
+        its next pipeline step, e.g. after face detection, instead of letting it run to completion in the background.
+        The `executor` argument, if any, runs the branches of both images (see `hybrid_merge`).
+        """
+        steps = StepExecutor(kwargs.pop("executor", None))
+        try:
+            return await self.run(_hybrid_merge_steps, steps, image1, image2, *args, **kwargs)
+        except asyncio.CancelledError:
+            steps.cancel()
+            raise
+
+    async def filter_image(self, image_filter: Filter, image: Image) -> Image:
+        """Awaitable `image_filter(image)`, e.g. of a `FaceFilter`."""
+        return await self.run(image_filter, image)
+
+    async def filter(self, image_filter: Filter, image_data: np.ndarray) -> np.ndarray:
+        """Awaitable `image_filter.filter(image_data)`."""
+        return await self.run(image_filter.filter, image_data)
+
+
+# runner used by the module level functions
+async_runner = AsyncRunner()
+
+
+async def hybrid_merge_async(image1: Image, image2: Image, *args, **kwargs) -> Union[Image, List[Image]]:
+    """Awaitable `hybrid_merge` running on `async_runner` (see `AsyncRunner.hybrid_merge`)."""
+    return await async_runner.hybrid_merge(image1, image2, *args, **kwargs)
+
+
+async def filter_image_async(image_filter: Filter, image: Image) -> Image:
+    """Awaitable `image_filter(image)` running on `async_runner`."""
+    return await async_runner.filter_image(image_filter, image)
+
+
+async def filter_async(image_filter: Filter, image_data: np.ndarray) -> np.ndarray:
+    """Awaitable `image_filter.filter(image_data)` running on `async_runner`."""
+    return await async_runner.filter(image_filter, image_data)
@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    as_completed,
+)
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from hybrid_face import console
+from hybrid_face.cli import save_hybrid, sigma_dict
+from hybrid_face.filters import face_location_cache, kernel_store
+from hybrid_face.hybrid_merge import hybrid_merge
+
+
+class BatchItem(NamedTuple):
+    near_image_path: Path
+    far_image_path: Path
+    output_file: Path
+    emphasis: str = "balanced"
+
+
+class BatchResult(NamedTuple):
+    item: BatchItem
+    seconds: float
+    error: Optional[str] = None
+
+
+def read_manifest(manifest_path: Path) -> List[BatchItem]:
+    """Reads a CSV (with header) or JSON-lines manifest with the columns/keys near, far, output and optionally emphasis.
+    Relative paths are resolved relative to the directory of the manifest.
+
+    Args:
+        manifest_path (Path): path to a .csv or .jsonl file
+
+    Returns:
+        List[BatchItem]: one item per row
+    """
+    manifest_path = Path(manifest_path)
+
+    with open(manifest_path, newline="") as manifest_file:
+        if manifest_path.suffix in (".jsonl", ".json"):
+            rows = [json.loads(line) for line in manifest_file if line.strip()]
+        else:
+            rows = list(csv.DictReader(manifest_file))
+
+    items = []
+    for line_number, row in enumerate(rows, start=1):
+        missing_keys = {"near", "far", "output"} - set(key for key, value in row.items() if value)
+        if missing_keys:
+            raise ValueError(f"Row {line_number} of {manifest_path} is missing {sorted(missing_keys)}")
+
+        emphasis = row.get("emphasis") or "balanced"
+        if emphasis not in sigma_dict:
+            raise ValueError(f"Row {line_number} of {manifest_path} has invalid emphasis {emphasis}")
+
+        near_path, far_path, output_path = (manifest_path.parent / row[key] for key in ("near", "far", "output"))
+        items.append(BatchItem(near_path, far_path, output_path, emphasis))
+
+    return items
+
+
+def _warm_up_worker(
+    face_cache_path: Optional[Path] = None, quiet: bool = True, kernel_store_path: Optional[Path] = None
+):
+    # workers are long lived so we pay for loading dlib and its models only once per process
+    try:
+        import face_recognition  # noqa: F401
+    except ImportError:  # pragma: no cover
+        pass
+
+    if face_cache_path is not None:
+        face_location_cache.path = face_cache_path
+    if kernel_store_path is not None:
+        kernel_store.path = kernel_store_path
+
+    # the progress output of many concurrent merges is unreadable, only the per-item reports are printed
+    console.quiet = quiet
+
+
+def process_item(item: BatchItem, merge_kwargs: Optional[Dict] = None) -> BatchResult:
+    """Creates and saves the hybrid image of a single manifest row. Failures are returned rather than raised."""
+    start = time.perf_counter()
+
+    try:
+        near_image = Image.open(item.near_image_path)
+        far_image = Image.open(item.far_image_path)
+        hybrid_image = hybrid_merge(near_image, far_image, sigma_dict[item.emphasis], **(merge_kwargs or {}))
+
+        Path(item.output_file).parent.mkdir(parents=True, exist_ok=True)
+        save_hybrid(hybrid_image, item.output_file)
+    except Exception as error:
+        return BatchResult(item, time.perf_counter() - start, f"{type(error).__name__}: {error}")
+
+    return BatchResult(item, time.perf_counter() - start)
+
+
+def run_batch(
+    items: List[BatchItem],
+    workers: Optional[int] = None,
+    merge_kwargs: Optional[Dict] = None,
+    face_cache_path: Optional[Path] = None,
+    kernel_store_path: Optional[Path] = None,
+) -> List[BatchResult]:
+    """Processes all manifest items across a pool of warm worker processes.
+
+    Args:
+        items (List[BatchItem]): manifest rows to process
+        workers (int, optional): Number of worker processes. Defaults to None, i.e. one per CPU. With a single worker
+            everything runs in the current process.
+        merge_kwargs (Dict, optional): Additional keyword arguments passed on to `hybrid_merge`. Defaults to None.
+        face_cache_path (Path, optional): sqlite file shared by all workers to persist face locations. Defaults to None.
+        kernel_store_path (Path, optional): Directory of precomputed kernels memory-mapped by all workers. Defaults to
+            None.
+
+    Returns:
+        List[BatchResult]: results in the order of `items`
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    if workers == 1:
+        _warm_up_worker(face_cache_path, console.quiet, kernel_store_path)
+        results = [report(process_item(item, merge_kwargs)) for item in items]
+    else:
+        initargs = (face_cache_path, True, kernel_store_path)
+        with ProcessPoolExecutor(workers, initializer=_warm_up_worker, initargs=initargs) as executor:
+            results = _run_in_executor(executor, items, merge_kwargs)
+
+    # print throughput
+    seconds = time.perf_counter() - start
+    failures = sum(result.error is not None for result in results)
+    console.print(
+        f"[bold]Processed {len(results)} items ({failures} failed) in {seconds:.2f} s",
+        f"with {workers} worker(s): {len(results) / max(seconds, 1e-9):.2f} items/s",
+    )
+
+    return results
+
+
+def _run_in_executor(executor: Executor, items: List[BatchItem], merge_kwargs: Optional[Dict]) -> List[BatchResult]:
+    futures = {executor.submit(process_item, item, merge_kwargs): index for index, item in enumerate(items)}
+
+    results: List[Tuple[int, BatchResult]] = []
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            result = future.result()
+        except BrokenExecutor as error:
+            # a worker died (e.g. killed for running out of memory), which fails its item and all pending ones
+            result = BatchResult(items[index], 0, f"{type(error).__name__}: {error}")
+        results.append((index, report(result)))
+
+    return [result for _, result in sorted(results, key=lambda indexed_result: indexed_result[0])]
+
+
+def report(result: BatchResult) -> BatchResult:
+    if result.error is None:
+        console.print(f"[green]Created [bold]{result.item.output_file}[/bold] in {result.seconds:.2f} s")
+    else:
+        console.print(
+            f"[red]Failed to create [bold]{result.item.output_file}[/bold] from {result.item.near_image_path}",
+            f"and {result.item.far_image_path}: {result.error}",
+        )
+    return result
@@ -15,15 +15,136 @@ also be used as template for Python modules.
 import argparse
 import sys
 from pathlib import Path
+from typing import List, Union
 
 from PIL import Image
 
 from hybrid_face import __version__
-from hybrid_face.hybrid_merge import hybrid_merge
+from hybrid_face.filters import Filter, face_location_cache, kernel_store
+from hybrid_face.filters.fft import fft_backends
+from hybrid_face.hybrid_merge import face_policies, hybrid_merge
 
 sigma_dict = {"far": 0.005, "balanced": 0.002, "near": 0.0005}
 
 
+def save_hybrid(hybrid_image: Union[Image.Image, List[Image.Image]], output_file: Path):
+    """Saves the hybrid image. The hybrid faces of all pairs (see `hybrid_merge`) are numbered, e.g. out-1.png,
+    out-2.png, ...
+
+    Args:
+      hybrid_image (Union[Image.Image, List[Image.Image]]): hybrid image or list of hybrid faces
+      output_file (Path): path of the output, or the pattern of numbered outputs
+    """
+    if not isinstance(hybrid_image, list):
+        hybrid_image.save(output_file)
+        return
+
+    output_file = Path(output_file)
+    for number, image in enumerate(hybrid_image, start=1):
+        image.save(output_file.with_name(f"{output_file.stem}-{number}{output_file.suffix}"))
+
+
+def merge_parser() -> argparse.ArgumentParser:
+    """Parent parser of the options shared by the single image cli and the batch subcommand, i.e. those passed on to
+    `hybrid_merge` and the caches
+
+    Returns:
+      :obj:`argparse.ArgumentParser`: parser without help to be used as parent
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument(
+        "--detection-max-side",
+        action="store",
+        type=int,
+        dest="detection_max_side",
+        default=None,
+        help="Detect faces on copies downscaled to at most this many pixels on the longer side",
+        metavar="PIXELS",
+    )
+
+    parser.add_argument(
+        "--detector",
+        action="store",
+        choices=["hog", "cnn"],
+        dest="detector",
+        default="hog",
+        help="Face detection model, hog is faster while cnn is more accurate",
+    )
+
+    parser.add_argument(
+        "--face-policy",
+        action="store",
+        choices=face_policies,
+        dest="face_policy",
+        default="single",
+        help="How to deal with images showing several faces: require a single one, pick the largest or most central "
+        "one, or merge all faces pairwise from left to right into numbered outputs",
+    )
+
+    parser.add_argument(
+        "--max-working-size",
+        action="store",
+        type=int,
+        dest="max_working_size",
+        default=None,
+        help="Downscale the images to at most this many pixels on the longer side before filtering, JPEGs are already "
+        "downscaled while decoding",
+        metavar="PIXELS",
+    )
+
+    parser.add_argument(
+        "--engine",
+        action="store",
+        choices=Filter.engines,
+        dest="engine",
+        default="fft",
+        help="Filtering engine, pyramid is the fastest for large images, multirate filters at a reduced resolution "
+        "and fft is exact",
+    )
+
+    parser.add_argument(
+        "--fft-backend",
+        action="store",
+        choices=tuple(fft_backends),
+        dest="fft_backend",
+        default=None,
+        help="FFT library (defaults to $HYBRID_FACE_FFT_BACKEND or numpy), falls back to numpy if not installed",
+    )
+
+    parser.add_argument(
+        "--fft-workers",
+        action="store",
+        type=int,
+        dest="fft_workers",
+        default=None,
+        help="Threads per FFT for the scipy and pyfftw backends (defaults to $HYBRID_FACE_FFT_WORKERS or one per CPU)",
+        metavar="THREADS",
+    )
+
+    parser.add_argument(
+        "--face-cache",
+        action="store",
+        type=Path,
+        dest="face_cache_path",
+        default=None,
+        help="sqlite file in which detected face locations are persisted so detection is skipped for known images",
+        metavar="FACE_CACHE",
+    )
+
+    parser.add_argument(
+        "--kernel-store",
+        action="store",
+        type=Path,
+        dest="kernel_store_path",
+        default=None,
+        help="Directory of precomputed kernels (see `hybrid-face warmup`), defaults to $HYBRID_FACE_KERNEL_STORE",
+        metavar="KERNEL_STORE",
+    )
+
+    return parser
+
+
 def parse_args(args):
     """Parse command line parameters
 
@@ -33,7 +154,11 @@ def parse_args(args):
     Returns:
       :obj:`argparse.Namespace`: command line parameters namespace
     """
-    parser = argparse.ArgumentParser(description="Command-line tool for creating hybrid images")
+    parser = argparse.ArgumentParser(
+        parents=[merge_parser()],
+        description="Command-line tool for creating hybrid images. Run `hybrid-face batch -h` to process a manifest "
+        "of many image pairs and `hybrid-face warmup -h` to precompute filter kernels"
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -93,29 +218,220 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
+def parse_batch_args(args):
+    """Parse command line parameters of the batch subcommand
+
+    Args:
+      args ([str]): command line parameters as list of strings
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        prog="hybrid-face batch",
+        parents=[merge_parser()],
+        description="Create many hybrid images from a CSV or JSON-lines manifest with the columns near, far, output "
+        "and optionally emphasis",
+    )
+
+    parser.add_argument(
+        "manifest_path",
+        action="store",
+        type=Path,
+        help="Path to the .csv or .jsonl manifest",
+        metavar="MANIFEST",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        action="store",
+        type=int,
+        dest="workers",
+        default=None,
+        help="Number of worker processes (defaults to the number of CPUs)",
+    )
+
+    return parser.parse_args(args)
+
+
+def image_shape(size: str):
+    """Parses WIDTHxHEIGHT into an image shape (height, width)"""
+    try:
+        width, height = (int(side) for side in size.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"image sizes must be given as WIDTHxHEIGHT. Got {size}")
+
+    return (height, width)
+
+
+def parse_warmup_args(args):
+    """Parse command line parameters of the warmup subcommand
+
+    Args:
+      args ([str]): command line parameters as list of strings
+
+    Returns:
+      :obj:`argparse.Namespace`: command line parameters namespace
+    """
+    parser = argparse.ArgumentParser(
+        prog="hybrid-face warmup",
+        description="Precompute the filter kernels of the given image sizes into a kernel store that is shared by "
+        "all processes using it (see --kernel-store)",
+    )
+
+    parser.add_argument(
+        "kernel_store_path",
+        action="store",
+        type=Path,
+        help="Directory in which the kernels are stored",
+        metavar="KERNEL_STORE",
+    )
+
+    parser.add_argument(
+        "--sizes",
+        action="store",
+        type=image_shape,
+        nargs="+",
+        required=True,
+        dest="image_shapes",
+        help="Sizes of the filtered images or faces, e.g. 1920x1080",
+        metavar="WIDTHxHEIGHT",
+    )
+
+    parser.add_argument(
+        "--emphasis",
+        action="store",
+        choices=list(sigma_dict),
+        nargs="+",
+        dest="emphases",
+        default=list(sigma_dict),
+        help="Emphases whose sigmas are precomputed (defaults to all)",
+    )
+
+    parser.add_argument(
+        "--precision",
+        action="store",
+        choices=["float32", "float64"],
+        nargs="+",
+        dest="precisions",
+        default=["float64"],
+        help="Floating point precisions of the kernels",
+    )
+
+    return parser.parse_args(args)
+
+
+def warmup_main(args):
+    """Entry point of the warmup subcommand
+
+    Args:
+      args ([str]): command line parameter list
+    """
+    from hybrid_face import console
+    from hybrid_face.filters import (
+        HighPassFaceFilter,
+        HighPassFilter,
+        LowPassFaceFilter,
+        LowPassFilter,
+        kernel_cache,
+    )
+
+    args = parse_warmup_args(args)
+
+    # kernels are only written to the store when they are computed, i.e. not if they are already in memory
+    kernel_store.path = args.kernel_store_path
+    kernel_store.read_only = False
+    kernel_cache.clear()
+
+    for filter_class in (LowPassFilter, HighPassFilter, LowPassFaceFilter, HighPassFaceFilter):
+        for emphasis in args.emphases:
+            for precision in args.precisions:
+                image_filter = filter_class(sigma_dict[emphasis], precision=precision)
+                for shape in args.image_shapes:
+                    image_filter.warm_up(shape)
+
+    console.print(
+        f"[bold]Stored {kernel_store.misses} kernels in {args.kernel_store_path}",
+        f"({kernel_store.hits} were already there)",
+    )
+
+
+def batch_main(args):
+    """Entry point of the batch subcommand
+
+    Args:
+      args ([str]): command line parameter list
+
+    Returns:
+      int: exit code, 1 if any item failed
+    """
+    # imported here to keep the startup of the single image cli lean
+    from hybrid_face.batch import read_manifest, run_batch
+
+    args = parse_batch_args(args)
+
+    items = read_manifest(args.manifest_path)
+    merge_kwargs = {
+        "detection_max_side": args.detection_max_side,
+        "detector": args.detector,
+        "max_working_size": args.max_working_size,
+        "face_policy": args.face_policy,
+        "engine": args.engine,
+        "fft_backend": args.fft_backend,
+        # the worker processes already use all CPUs, so each of them runs single-threaded ffts by default
+        "fft_workers": args.fft_workers or (None if args.workers == 1 else 1),
+    }
+    results = run_batch(items, args.workers, merge_kwargs, args.face_cache_path, args.kernel_store_path)
+
+    return int(any(result.error is not None for result in results))
+
+
 def main(args):
     """Main entry point allowing external calls
 
     Args:
       args ([str]): command line parameter list
     """
+    if args and args[0] == "batch":
+        return batch_main(args[1:])
+    if args and args[0] == "warmup":
+        return warmup_main(args[1:])
+
     args = parse_args(args)
 
+    if args.face_cache_path is not None:
+        face_location_cache.path = args.face_cache_path
+    if args.kernel_store_path is not None:
+        kernel_store.path = args.kernel_store_path
+
     sigma = sigma_dict[args.emphasis]
     near_image = Image.open(args.near_image_path)
     far_image = Image.open(args.far_image_path)
-    hybrid_image = hybrid_merge(near_image, far_image, sigma)
+    hybrid_image = hybrid_merge(
+        near_image,
+        far_image,
+        sigma,
+        detection_max_side=args.detection_max_side,
+        detector=args.detector,
+        engine=args.engine,
+        fft_backend=args.fft_backend,
+        fft_workers=args.fft_workers,
+        max_working_size=args.max_working_size,
+        face_policy=args.face_policy,
+    )
 
     if args.show:
-        hybrid_image.show()
+        for image in hybrid_image if isinstance(hybrid_image, list) else [hybrid_image]:
+            image.show()
 
     if args.output_file is not None:
-        hybrid_image.save(args.output_file)
+        save_hybrid(hybrid_image, args.output_file)
 
 
 def run():
     """Entry point for console_scripts"""
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))
 
 
 if __name__ == "__main__":
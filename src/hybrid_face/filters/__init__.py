@@ -1,7 +1,11 @@
 from hybrid_face.filters.base import Filter
+from hybrid_face.filters.face_cache import FaceLocationCache, face_location_cache
 from hybrid_face.filters.face_filters import (
     FaceFilter,
     HighPassFaceFilter,
     LowPassFaceFilter,
 )
 from hybrid_face.filters.global_filters import HighPassFilter, LowPassFilter
+from hybrid_face.filters.kernel_cache import KernelCache, kernel_cache
+from hybrid_face.filters.kernel_store import KernelStore, kernel_store
+from hybrid_face.filters.workspace import Workspace, WorkspacePool, workspace_pool
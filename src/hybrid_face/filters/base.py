@@ -1,10 +1,66 @@
+import copy
+import sys
 from abc import ABC, abstractmethod
-from functools import lru_cache
-from typing import Tuple
+from pathlib import Path
+from typing import Hashable, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PIL import Image
 
+from hybrid_face.filters.fft import (
+    FFTBackend,
+    fft_backends,
+    get_fft_backend,
+    next_fast_len,
+)
+from hybrid_face.filters.kernel_cache import kernel_cache
+from hybrid_face.filters.multirate import decimate, interpolate, resampling_variance
+from hybrid_face.filters.pyramid import levels_for_std, pyramid_low_pass
+from hybrid_face.filters.workspace import Workspace, workspace_pool
+
+
+def _convolve_axis(data: np.ndarray, taps: np.ndarray, axis: int) -> np.ndarray:
+    # direct convolution of `data` along `axis` with symmetric taps of odd length, zero outside of the data
+    radius = len(taps) // 2
+    length = data.shape[axis]
+
+    padding = [(0, 0)] * data.ndim
+    padding[axis] = (radius, radius)
+    padded_data = np.pad(data, padding)
+
+    def shifted(offset: int) -> np.ndarray:
+        index = [slice(None)] * data.ndim
+        index[axis] = slice(radius + offset, radius + offset + length)
+        return padded_data[tuple(index)]
+
+    # symmetric taps: add both neighbours first to halve the multiplications
+    result = taps[radius] * data
+    neighbours = np.empty_like(result)
+    for offset in range(1, radius + 1):
+        np.add(shifted(-offset), shifted(offset), out=neighbours)
+        neighbours *= taps[radius + offset]
+        result += neighbours
+
+    return result
+
+
+def _store(out: np.ndarray, region: Tuple[slice, slice], values: np.ndarray):
+    # round and clip if written to an integer (e.g. 8-bit) output
+    if np.issubdtype(out.dtype, np.integer):
+        dtype_info = np.iinfo(out.dtype)
+        values = np.clip(np.rint(values), dtype_info.min, dtype_info.max)
+
+    out[region] = values
+
+
+def _output(values: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    # store in out if given, otherwise return as is
+    if out is None:
+        return values
+
+    _store(out, (Ellipsis,), values)
+    return out
+
 
 class Filter(ABC):
     """
@@ -20,81 +76,722 @@ class Filter(ABC):
 
     epsilon: float = 0.00001
 
-    def __init__(self, sigma: float = 0.0015):
+    # how many spatial standard deviations of the kernel are considered its effective support
+    truncate: float = 4.0
+
+    # "double" pads (n, m) images to (2n, 2m), "fast" rounds that up to a fast FFT length and "minimal" only pads by
+    # the spatial support of the kernel (again rounded up to a fast FFT length)
+    padding_modes = ("double", "fast", "minimal")
+
+    # lower bound for the side length of the tiles used by `filter_tiled`
+    min_tile_length: int = 512
+
+    # separable kernels (see `kernel_factor`) are either g(x) g(y) or, for complementary filters, 1 - g(x) g(y)
+    complement: bool = False
+
+    # size of the blocks in which separable kernels are applied to spectra (see `apply_kernel`)
+    block_bytes: int = 64 * 1024
+
+    # "fft" filters in the frequency domain, "direct" convolves with the separable spatial kernel (see `filter_direct`),
+    # "auto" picks the cheaper of both per image shape (see `choose_engine`), "pyramid" approximates the filter with
+    # image pyramids (see `filter_pyramid`) and "multirate" filters a decimated copy of the image (see
+    # `filter_multirate`)
+    engines = ("fft", "direct", "auto", "pyramid", "multirate")
+
+    # cost of one tap of the direct engine per pixel relative to one fft operation per padded pixel, measured with numpy
+    direct_cost_factor: float = 2.0
+
+    # floating point precision of the whole pipeline. Single precision halves the memory traffic and the size of the
+    # cached kernels, which is plenty for 8-bit images
+    precisions = ("float32", "float64")
+
+    def __init__(
+        self,
+        sigma: float = 0.0015,
+        padding: str = "double",
+        engine: str = "fft",
+        precision: str = "float64",
+        fft_backend: Optional[str] = None,
+        fft_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            sigma (float, optional): The soft cut-off frequency of the filter. Defaults to 0.0015.
+            padding (str, optional): Padding policy, one of `padding_modes`. Defaults to "double".
+            engine (str, optional): Filtering engine, one of `engines`. Defaults to "fft".
+            precision (str, optional): Working precision, one of `precisions`. Defaults to "float64".
+            fft_backend (str, optional): Name of the fft library, see `hybrid_face.filters.fft.fft_backends`.
+                Defaults to None, i.e. the HYBRID_FACE_FFT_BACKEND environment variable or numpy.
+            fft_workers (int, optional): Threads per fft for backends that support it. Defaults to None, i.e. the
+                HYBRID_FACE_FFT_WORKERS environment variable or one per CPU.
+        """
+        if padding not in self.padding_modes:
+            raise ValueError(f"padding must be one of {self.padding_modes}. Got {padding}")
+        if engine not in self.engines:
+            raise ValueError(f"engine must be one of {self.engines}. Got {engine}")
+        if precision not in self.precisions:
+            raise ValueError(f"precision must be one of {self.precisions}. Got {precision}")
+        if fft_backend is not None and fft_backend not in fft_backends:
+            raise ValueError(f"fft_backend must be one of {tuple(fft_backends)}. Got {fft_backend}")
+
         self.sigma = sigma
+        self.padding = padding
+        self.engine = engine
+        self.precision = precision
+        self.fft_backend = fft_backend
+        self.fft_workers = fft_workers
+
+    @property
+    def fft(self) -> FFTBackend:
+        """The fft backend. It is looked up on use, so filters only store its name and stay cheap to copy and pickle."""
+        return get_fft_backend(self.fft_backend, self.fft_workers)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Real dtype of the filtered data and the kernels, the spectra are of the corresponding complex dtype."""
+        return np.dtype(self.precision)
 
     @abstractmethod
     def kernel_function(self, xx: np.ndarray, yy: np.ndarray) -> np.ndarray:
         pass
 
-    @lru_cache
-    def get_kernel(self, image_shape: Tuple[int, int], show_kernel: bool = False) -> np.ndarray:
-
+    def kernel_factor(self, x_range: np.ndarray) -> Optional[np.ndarray]:
+        """1-D factor g of separable kernels, i.e. kernel_function(x, y) = g(x) g(y) or 1 - g(x) g(y) if `complement`
+        is set. Such kernels are cached as two vectors instead of a dense grid. Returns None for kernels that do not
+        factor, which are then sampled densely."""
+        return None
+
+    def spatial_std(self) -> float:
+        """Standard deviation in pixels of the spatial kernel.
+
+        The frequency kernel exp(-x^2 / (2 sigma)) is sampled with x = 2f (f in cycles per pixel), which corresponds to
+        a spatial gaussian with standard deviation 1 / (pi sqrt(sigma)). Filters with non-gaussian kernels should
+        override this.
+        """
+        return 1 / (np.pi * np.sqrt(self.sigma + self.epsilon))
+
+    def spatial_support(self) -> int:
+        """Radius in pixels beyond which the spatial kernel is negligible. Kernels that are cut off by the sampling
+        have unbounded support (sys.maxsize). Filters with non-gaussian kernels should override this.
+        """
+        # if the kernel has not decayed by the nyquist frequency, sampling cuts it off and the spatial kernel gets
+        # slowly decaying (sinc) tails, i.e. it has no compact support
+        if np.exp(-0.5 / (self.sigma + self.epsilon)) > self.epsilon:
+            return sys.maxsize
+
+        return int(np.ceil(self.truncate * self.spatial_std()))
+
+    def spatial_taps(self) -> Optional[np.ndarray]:
+        """Normalised 1-D spatial kernel of length 2 * `spatial_support` + 1 whose separable convolution approximates
+        the low-pass part of the kernel, i.e. the inverse transform of `kernel_factor`. Returns None for kernels that
+        are not separable or have no compact support. Filters with non-gaussian factors should override this."""
+        support = self.spatial_support()
+        if self.kernel_factor(np.zeros(1)) is None or support == sys.maxsize:
+            return None
+
+        offsets = np.arange(-support, support + 1)
+        taps = np.exp(-0.5 * (offsets / self.spatial_std()) ** 2)
+
+        return taps / taps.sum()
+
+    def get_padded_shape(self, image_shape: Tuple[int, int]) -> Tuple[int, int]:
+        """Shape of the zero-padded grid on which an image of shape `image_shape` is filtered."""
         n, m = image_shape
 
-        # double resolution due to padding
-        x_range, y_range = np.linspace(-1, 1, 2 * n), np.linspace(-1, 1, 2 * m)
+        if self.padding == "double":
+            return (2 * n, 2 * m)
+
+        if self.padding == "fast":
+            return (next_fast_len(2 * n), next_fast_len(2 * m))
+
+        # padding by the kernel support avoids wrap-around, more than doubling is never needed
+        support = self.spatial_support()
+        return (next_fast_len(min(n + support, 2 * n)), next_fast_len(min(m + support, 2 * m)))
+
+    def kernel_key(self, padded_shape: Tuple[int, int], kind: str) -> Hashable:
+        """Key under which the kernel is stored in the shared kernel cache and named in the kernel store. It has to
+        capture everything the kernel depends on, so subclasses adding kernel parameters need to extend it."""
+        return (type(self), self.sigma, self.epsilon, tuple(padded_shape), kind, self.precision)
+
+    def get_kernel(
+        self, image_shape: Tuple[int, int], show_kernel: bool = False, half_plane: bool = False
+    ) -> np.ndarray:
+
+        # kernels only depend on the padded grid, so images of different shapes can share them
+        kernel = self.get_grid_kernel(self.get_padded_shape(image_shape), half_plane)
+
+        # display centered kernel in inverse grey scale if wanted
+        if show_kernel and not half_plane and kernel.max() > 0:
+            centered_kernel = np.fft.fftshift(kernel)
+            Image.fromarray(256 - (centered_kernel / centered_kernel.max() * 256)).show()
+
+        return kernel
+
+    def get_grid_kernel(
+        self, padded_shape: Tuple[int, int], half_plane: bool = False, exact: bool = True
+    ) -> np.ndarray:
+        """Same as `get_kernel` but for a given (P, Q) grid rather than the grid an image shape is padded to.
+
+        With `exact` sampling the kernel function is evaluated at x = 2f for the frequency f (in cycles per pixel) of
+        each FFT bin, so the filter does not depend on the grid size. Otherwise [-1, 1] is sampled with `linspace`
+        as originally done for the (2n, 2m) grid, which is slightly off for small grids and, for even lengths, not
+        symmetric. Defaults to exact sampling, which all padding modes use.
+        """
+        # the real fft only keeps the non-negative frequencies of the last axis
+        if half_plane:
+            key = self.kernel_key(padded_shape, f"half-plane-{exact}")
+            return kernel_cache.get(key, lambda: self._make_half_plane_kernel(padded_shape, exact))
+
+        key = self.kernel_key(padded_shape, f"full-{exact}")
+        return kernel_cache.get(key, lambda: self._make_kernel(padded_shape, exact))
+
+    @staticmethod
+    def _sample_points(length: int, exact: bool = False) -> np.ndarray:
+        if exact:
+            # sample at the frequencies of the fft bins, already in (unshifted) fft order
+            return 2 * np.fft.fftfreq(length)
+
+        # sample on the padded grid and move the zero frequency from the center to the origin so the kernel matches
+        # the (unshifted) frequency order of the fft. This replaces multiplying the data with (-1)^(i+j)
+        return np.fft.ifftshift(np.linspace(-1, 1, length))
+
+    def _make_kernel(self, padded_shape: Tuple[int, int], exact: bool = False) -> np.ndarray:
+        P, Q = padded_shape
+
+        x_range, y_range = self._sample_points(P, exact), self._sample_points(Q, exact)
         xx, yy = np.meshgrid(x_range, y_range, indexing="ij", sparse=True)
 
         kernel = self.kernel_function(xx, yy)
 
         # zero if kernel is below precision
         if kernel.sum() < self.epsilon:
-            return np.zeros_like(kernel)
+            return np.zeros_like(kernel, dtype=self.dtype)
+
+        return kernel.astype(self.dtype)
+
+    def _make_half_plane_kernel(self, padded_shape: Tuple[int, int], exact: bool = False) -> np.ndarray:
+        kernel = self._make_kernel(padded_shape, exact)
+        P, Q = kernel.shape
+
+        # the spectrum of real data is hermitian, i.e. X[k, l] = conj(X[-k, -l]). Taking the real part of
+        # ifft2(X * kernel) is therefore the same as filtering with the symmetrised kernel
+        # (kernel[k, l] + kernel[-k, -l]) / 2 which in turn only needs to be known on half of the plane
+        mirrored_kernel = np.roll(kernel[::-1, ::-1], 1, axis=(0, 1))
+        symmetric_kernel = (kernel + mirrored_kernel) / 2
+
+        return np.ascontiguousarray(symmetric_kernel[:, : Q // 2 + 1])  # (P, Q // 2 + 1)
+
+    def get_kernel_factors(
+        self, padded_shape: Tuple[int, int], exact: bool = True
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Half-plane kernel of separable filters as a (P,) row and a (Q // 2 + 1,) column factor, so the cached kernel
+        needs O(P + Q) rather than O(PQ) memory. The low-pass part of the kernel is their outer product.
+
+        Returns None if the filter is not separable (see `kernel_factor`) or if the grid is not sampled symmetrically
+        (see `_symmetric_sampling`). Symmetrising g(x) g(y) (see `_make_half_plane_kernel`) would then yield two
+        separable terms, which cost more to apply than the dense kernel, so the dense kernel is used instead.
+        """
+        if self.kernel_factor(np.zeros(1)) is None:
+            return None
+        if not all(self._symmetric_sampling(length, exact) for length in padded_shape):
+            return None
+
+        key = self.kernel_key(padded_shape, f"factors-{exact}")
+        return kernel_cache.get(key, lambda: self._make_kernel_factors(padded_shape, exact))
+
+    @classmethod
+    def _symmetric_sampling(cls, length: int, exact: bool = False) -> bool:
+        # whether the bins k and -k are sampled at x and -x, so the (even) factor g takes the same value on both. This
+        # holds for exact sampling, but `linspace` is only symmetric for odd lengths
+        sample_points = np.abs(cls._sample_points(length, exact))
+        return np.allclose(sample_points, np.roll(sample_points[::-1], 1))
+
+    def _make_kernel_factors(self, padded_shape: Tuple[int, int], exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        P, Q = padded_shape
+
+        row_factor = self.kernel_factor(self._sample_points(P, exact))
+        column_factor = self.kernel_factor(self._sample_points(Q, exact))
+
+        # same precision cut-off as for dense kernels: a (numerically) zero kernel is g = 0 or, for complementary
+        # kernels, g = 1
+        kernel_sum = row_factor.sum() * column_factor.sum()
+        if self.complement and P * Q - kernel_sum < self.epsilon:
+            row_factor, column_factor = np.ones(P), np.ones(Q)
+        elif not self.complement and kernel_sum < self.epsilon:
+            row_factor, column_factor = np.zeros(P), np.zeros(Q)
+
+        return (
+            np.ascontiguousarray(row_factor, dtype=self.dtype),
+            np.ascontiguousarray(column_factor[: Q // 2 + 1], dtype=self.dtype),
+        )
+
+    def apply_kernel(
+        self, fft_data: np.ndarray, padded_shape: Tuple[int, int], exact: bool = True
+    ) -> np.ndarray:
+        """Multiplies the (..., P, Q // 2 + 1) half-plane spectrum `fft_data` in place with the kernel of the (P, Q)
+        grid. Separable kernels are applied by broadcasting their factors, dense kernels are looked up as usual.
+
+        Returns:
+            np.ndarray: `fft_data`
+        """
+        factors = self.get_kernel_factors(padded_shape, exact)
+
+        if factors is None:
+            fft_data *= self.get_grid_kernel(padded_shape, half_plane=True, exact=exact)
+            return fft_data
+
+        # build the dense kernel block by block from the factors, each block small enough to stay in cache, so the
+        # spectrum is multiplied in a single pass without holding the whole kernel or a full-size scratch copy
+        row_factor, column_factor = factors
+        rows = fft_data.shape[-2]
+        block_rows = min(rows, max(1, self.block_bytes // fft_data[..., :1, :].nbytes))
+        kernel_buffer = np.empty((block_rows, len(column_factor)), dtype=row_factor.dtype)
+
+        for start in range(0, rows, block_rows):
+            block = fft_data[..., start : start + block_rows, :]
+            kernel_block = np.multiply(
+                row_factor[start : start + block_rows, None], column_factor, out=kernel_buffer[: block.shape[-2]]
+            )
+
+            # complementary kernels are the identity minus the separable low-pass
+            if self.complement:
+                np.subtract(1, kernel_block, out=kernel_block)
+
+            block *= kernel_block
+
+        return fft_data
+
+    def warm_up(self, image_shape: Tuple[int, int]):
+        """Builds the kernel that `apply_kernel` uses for images of shape `image_shape`, so it is cached (and written
+        to a writable kernel store) before the first image arrives."""
+        padded_shape = self.get_padded_shape(image_shape)
+        if self.get_kernel_factors(padded_shape) is None:
+            self.get_grid_kernel(padded_shape, half_plane=True)
+
+    def transform(
+        self,
+        image_data: np.ndarray,
+        padded_shape: Optional[Tuple[int, int]] = None,
+        workspace: Optional[Workspace] = None,
+    ) -> np.ndarray:
+        """Zero-pads the (..., n, m) image data to (..., P, Q) (see `get_padded_shape`) and returns its half-plane
+        spectrum of shape (..., P, Q // 2 + 1). Leading axes are treated as a batch. With a `workspace` of matching
+        shape, padding and spectrum are written to its buffers instead of newly allocated arrays."""
+        n, m = image_data.shape[-2:]
+        P, Q = padded_shape or self.get_padded_shape((n, m))
+
+        if workspace is not None:
+            return self.fft.rfft2(workspace.load(image_data), out=workspace.fft_data)
+
+        # pad image, converting it to the working precision
+        padding = ((0, 0),) * (image_data.ndim - 2) + ((0, P - n), (0, Q - m))
+        padded_data = np.pad(np.asarray(image_data, dtype=self.dtype), padding)  # (..., P, Q)
+
+        # move to freq domain. The data is real so we only need half of the spectrum
+        return self.fft.rfft2(padded_data)  # (..., P, Q // 2 + 1)
+
+    def inverse_transform(
+        self,
+        fft_data: np.ndarray,
+        image_shape: Tuple[int, int],
+        padded_shape: Optional[Tuple[int, int]] = None,
+        workspace: Optional[Workspace] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Inverse of `transform`. Moves a half-plane spectrum back to the spacial domain and removes the padding.
+        With a `workspace`, its padded buffer receives the inverse transform and `fft_data` may be overwritten. The
+        result is written to `out` if given."""
+        n, m = image_shape
+        padded_shape = padded_shape or self.get_padded_shape(image_shape)
 
-        # display in inverse grey scale if wanted
-        if show_kernel:
-            Image.fromarray(256 - (kernel / kernel.max() * 256)).show()
+        # move back to spacial domain. The result is real by construction
+        if workspace is None:
+            padded_result = self.fft.irfft2(fft_data, padded_shape)
+        else:
+            padded_result = self.fft.irfft2(fft_data, padded_shape, out=workspace.padded_data, overwrite_input=True)
 
-        return kernel
+        # undo padding
+        result = padded_result[..., 0:n, 0:m]
+        if out is not None:
+            return _output(result, out)
+
+        # results must not alias the workspace, which is overwritten by the next call
+        if workspace is not None and np.may_share_memory(result, workspace.padded_data):
+            return result.copy()
+
+        return result
+
+    def choose_engine(self, image_shape: Tuple[int, int]) -> str:
+        """Engine used for images of shape `image_shape`. With "auto", the direct engine is chosen if its estimated
+        cost, proportional to the number of taps per pixel, is below that of the padded fft. The direct engine is
+        only available for separable kernels with a compact support smaller than the image, otherwise "fft" is used.
+        The same goes for "pyramid" and non-separable kernels, as well as for "multirate" if the kernel is too wide to
+        decimate the image (see `decimation_factor`).
+        """
+        n, m = image_shape
+        support = self.spatial_support()
+
+        if self.engine == "pyramid":
+            return "fft" if self.kernel_factor(np.zeros(1)) is None else "pyramid"
+        if self.engine == "multirate":
+            separable = self.kernel_factor(np.zeros(1)) is not None
+            return "multirate" if separable and self.decimation_factor() > 1 else "fft"
+
+        if self.engine == "fft" or support >= min(n, m) or self.spatial_taps() is None:
+            return "fft"
+        if self.engine == "direct":
+            return "direct"
+
+        P, Q = self.get_padded_shape(image_shape)
+        fft_cost = P * Q * np.log2(P * Q)
+        direct_cost = self.direct_cost_factor * n * m * (2 * support + 1)
+
+        return "direct" if direct_cost < fft_cost else "fft"
+
+    def filter_direct(self, image_data: np.ndarray) -> np.ndarray:
+        """Filters (..., n, m) image data in the spatial domain by convolving it with `spatial_taps` along both axes.
+        Complementary (high-pass) filters return the image minus its low-pass. Leading axes are treated as a batch.
+
+        The spatial kernel is truncated at `spatial_support` and the image is zero outside of its borders, as for the
+        zero-padded fft. Since `filter` samples the kernel exactly, results on 8-bit data are within a few hundredths
+        of a grey level of it, independently of the image size. Kernels sampled with `linspace` (`exact=False`, see
+        `get_grid_kernel`) differ by up to a few grey levels on small grids.
+        """
+        taps = self.spatial_taps()
+        if taps is None:
+            raise ValueError(f"the {self.__name__} with sigma {self.sigma} has no compact separable spatial kernel")
+
+        # convolve rows and columns one after the other
+        image_data = np.asarray(image_data, dtype=self.dtype)
+        taps = taps.astype(self.dtype)
+        low_pass_data = _convolve_axis(image_data, taps, axis=-2)
+        low_pass_data = _convolve_axis(low_pass_data, taps, axis=-1)
+
+        if self.complement:
+            return image_data - low_pass_data
+
+        return low_pass_data
+
+    def pyramid_levels(self) -> int:
+        """Number of gaussian pyramid levels used by `filter_pyramid`."""
+        return levels_for_std(self.spatial_std())
+
+    def filter_pyramid(self, image_data: np.ndarray) -> np.ndarray:
+        """Approximates the filter using image pyramids: the low-pass is the gaussian pyramid level of matching blur
+        (see `pyramid_levels`) expanded to full resolution and the high-pass is the image minus that, i.e. the sum of
+        its finer laplacian bands. Costs O(nm) rather than O(nm log(nm)). Unlike the other engines, the image is
+        reflected rather than zero-padded at its borders. Leading axes are treated as a batch.
+        """
+        if self.kernel_factor(np.zeros(1)) is None:
+            raise ValueError(f"the {self.__name__} is not separable and cannot be approximated by image pyramids")
+
+        image_data = np.asarray(image_data, dtype=self.dtype)
+        low_pass_data = pyramid_low_pass(image_data, self.spatial_std())
+
+        if self.complement:
+            return image_data - low_pass_data
+
+        return low_pass_data
+
+    def decimation_factor(self) -> int:
+        """Decimation factor of `filter_multirate`: the largest one whose nyquist frequency still lies `truncate`
+        standard deviations of the frequency kernel above zero and whose resampling blurs less than the kernel itself,
+        so a (narrower) kernel is left to apply to the decimated image."""
+        # the kernel exp(-x^2 / (2 sigma)) sampled at x = 2f has a standard deviation of sqrt(sigma) / 2 in cycles per
+        # pixel, while decimating by D moves the nyquist frequency from 1 / 2 to 1 / (2D)
+        factor = max(1, int(1 / (self.truncate * np.sqrt(self.sigma + self.epsilon))))
+
+        # small truncations allow factors whose resampling alone blurs more than the kernel
+        while factor > 1 and resampling_variance(factor) >= self.spatial_std() ** 2:
+            factor -= 1
+
+        return factor
+
+    def filter_multirate(self, image_data: np.ndarray) -> np.ndarray:
+        """Computes the low-pass at a lower sampling rate: the image is decimated by `decimation_factor` (averaging
+        blocks of pixels), filtered in the frequency domain with the correspondingly narrower kernel and linearly
+        interpolated back to full resolution. The kernel of the decimated image accounts for the blur of decimation
+        and interpolation (see `resampling_variance`), so the result matches the exact low-pass closely while the fft
+        runs on a grid D^2 times smaller. Complementary (high-pass) filters return the image minus this low-pass.
+        Leading axes are treated as a batch.
+        """
+        if self.kernel_factor(np.zeros(1)) is None:
+            raise ValueError(f"the {self.__name__} is not separable and cannot be computed at a lower sampling rate")
+
+        factor = self.decimation_factor()
+        image_data = np.asarray(image_data, dtype=self.dtype)
+        decimated_data = decimate(image_data, factor)
+
+        # spatial variance left for the kernel, in decimated pixels, and the sigma of the matching kernel
+        variance = (self.spatial_std() ** 2 - resampling_variance(factor)) / factor ** 2
+        decimated_filter = self.with_sigma(1 / (np.pi ** 2 * variance) - self.epsilon)
+
+        # pad the small grid to a fast fft length
+        decimated_filter.padding = "fast"
+
+        filtered_data = decimated_filter.filter_fft(decimated_data)
+        low_pass_data = interpolate(
+            decimated_data - filtered_data if self.complement else filtered_data, image_data.shape[-2:], factor
+        )
+
+        if self.complement:
+            return image_data - low_pass_data
+
+        return low_pass_data
+
+    def filter_fft(self, image_data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Filters (..., n, m) image data in the frequency domain. Padding, spectrum and inverse transform live in the
+        calling thread's workspace for this shape (see `workspace_pool`), so repeated calls on equally sized images
+        do not allocate full-size temporaries, apart from the result if no `out` is given. Leading axes are treated
+        as a batch."""
+        image_shape = image_data.shape[-2:]
+        padded_shape = self.get_padded_shape(image_shape)
+        workspace = workspace_pool.get((*image_data.shape[:-2], *padded_shape), self.dtype)
+
+        # move to freq domain
+        fft_data = self.transform(image_data, padded_shape, workspace)
 
-    @lru_cache
-    def get_shift_matrix(self, image_shape: Tuple[int, int]) -> np.ndarray:
-        P, Q = 2 * image_shape[0], 2 * image_shape[1]
-        i = np.arange(P).reshape((P, 1))
-        j = np.arange(Q).reshape((1, Q))
+        # apply matching half-plane freq filter
+        self.apply_kernel(fft_data, padded_shape)
 
-        return (-1) ** (i + j)  # (P, Q) via broadcasting
+        # move back to spacial domain
+        return self.inverse_transform(fft_data, image_shape, padded_shape, workspace, out)
+
+    def filter(self, image_data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Filters (n, m) image data with the engine chosen by `choose_engine`.
 
-    def filter(self, image_data: np.ndarray) -> np.ndarray:
+        Args:
+            image_data (np.ndarray): (n, m) image data
+            out (np.ndarray, optional): Preallocated (n, m) output, integer outputs are rounded and clipped.
+                Defaults to None.
 
+        Returns:
+            np.ndarray: (n, m) filtered image data, i.e. `out` if it was given
+        """
+        # assert image_data has valid shape
+        if len(image_data.shape) != 2:
+            raise ValueError(f"image data must have shape (n, m). Got {image_data.shape}")
+        if out is not None and out.shape != image_data.shape:
+            raise ValueError(f"out must have shape {image_data.shape}. Got {out.shape}")
+
+        engine = self.choose_engine(image_data.shape)
+        if engine == "direct":
+            return _output(self.filter_direct(image_data), out)
+        if engine == "pyramid":
+            return _output(self.filter_pyramid(image_data), out)
+        if engine == "multirate":
+            return _output(self.filter_multirate(image_data), out)
+
+        return self.filter_fft(image_data, out)
+
+    def filter_batch(
+        self, images: Union[np.ndarray, Sequence[np.ndarray]], out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Filters a stack of equally shaped images with a single batched FFT.
+
+        Args:
+            images (Union[np.ndarray, Sequence[np.ndarray]]): (B, n, m) array or list of (n, m) arrays
+            out (np.ndarray, optional): Preallocated (B, n, m) output. Defaults to None.
+
+        Returns:
+            np.ndarray: (B, n, m) array of filtered images, i.e. `out` if it was given
+        """
+        if not isinstance(images, np.ndarray):
+            shapes = set(np.shape(image) for image in images)
+            if len(shapes) > 1:
+                raise ValueError(f"all images in a batch must have the same shape. Got {shapes}")
+            images = np.stack(images)
+
+        # assert images has valid shape
+        if len(images.shape) != 3:
+            raise ValueError(f"image batch must have shape (B, n, m). Got {images.shape}")
+
+        if out is not None and out.shape != images.shape:
+            raise ValueError(f"out must have shape {images.shape}. Got {out.shape}")
+
+        engine = self.choose_engine(images.shape[1:])
+        if engine == "direct":
+            return _output(self.filter_direct(images), out)
+        if engine == "pyramid":
+            return _output(self.filter_pyramid(images), out)
+        if engine == "multirate":
+            return _output(self.filter_multirate(images), out)
+
+        # transforms along the last two axes, broadcasting the kernel across the batch
+        return self.filter_fft(images, out)
+
+    def with_sigma(self, sigma: float) -> "Filter":
+        """Returns a copy of this filter with a different sigma but otherwise identical settings."""
+        clone = copy.copy(self)
+        clone.sigma = sigma
+        return clone
+
+    def filter_sigmas(
+        self, image_data: np.ndarray, sigmas: Sequence[float], batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """Filters one image for many sigmas, e.g. to choose an emphasis. The forward FFT is computed only once and
+        the inverse FFTs are batched, so the cost grows with the number of inverse transforms only.
+
+        Args:
+            image_data (np.ndarray): (n, m) image data
+            sigmas (Sequence[float]): cut-off frequencies to filter with
+            batch_size (int, optional): Number of inverse transforms computed at once, bounds the memory used.
+                Defaults to None, i.e. all at once.
+
+        Returns:
+            np.ndarray: (len(sigmas), n, m) filtered images, one per sigma
+        """
         # assert image_data has valid shape
         if len(image_data.shape) != 2:
             raise ValueError(f"image data must have shape (n, m). Got {image_data.shape}")
 
-        n, m = image_data.shape
+        image_shape = image_data.shape
+        filters = [self.with_sigma(sigma) for sigma in sigmas]
 
-        # pad image
-        padded_data = np.pad(image_data, ((0, n), (0, m)))  # (2N, 2M)
+        # a grid that is large enough for every sigma (the minimal padding depends on sigma)
+        padded_shapes = [image_filter.get_padded_shape(image_shape) for image_filter in filters] or [(0, 0)]
+        padded_shape = tuple(max(lengths) for lengths in zip(*padded_shapes))
 
-        # center image freq
-        shift_matrix = self.get_shift_matrix(image_data.shape)
-        centered_padded_data = padded_data * shift_matrix
+        # move to freq domain once
+        fft_data = self.transform(image_data, padded_shape)
 
-        # move to freq domain
-        fft_data = np.fft.fft2(centered_padded_data)
+        filtered_images = np.empty((len(filters), *image_shape), dtype=self.dtype)
+        batch_size = batch_size or max(1, len(filters))
 
-        # get freq filter
-        freq_filter = self.get_kernel(image_data.shape)
+        for start in range(0, len(filters), batch_size):
+            batch_filters = filters[start : start + batch_size]
 
-        # apply filter
-        filtered_data = fft_data * freq_filter
+            # apply the kernels of the batch and move back with a single batched inverse transform
+            batch_data = np.empty((len(batch_filters), *fft_data.shape), dtype=fft_data.dtype)
+            for filter_data, image_filter in zip(batch_data, batch_filters):
+                filter_data[...] = fft_data
+                image_filter.apply_kernel(filter_data, padded_shape)
 
-        # move back to spacial domain
-        centered_padded_result = np.fft.ifft2(filtered_data)
+            filtered_images[start : start + len(batch_filters)] = self.inverse_transform(
+                batch_data, image_shape, padded_shape
+            )
 
-        # undo centering
-        padded_result = centered_padded_result * shift_matrix
+        return filtered_images
 
-        # undo padding
-        filtered_image = padded_result[0:n, 0:m]
+    def get_tile_shape(self, image_shape: Tuple[int, int]) -> Tuple[int, int]:
+        """Shape of the tiles used by `filter_tiled`. Tiles are chosen large compared to the kernel support (so the
+        overlap is cheap) such that tile plus overlap is a fast FFT length, but never larger than the image."""
+        support = min(self.spatial_support(), max(image_shape))
+        grid_length = next_fast_len(max(self.min_tile_length, 8 * support) + 2 * support)
+        tile_length = grid_length - 2 * support
+
+        return (min(tile_length, image_shape[0]), min(tile_length, image_shape[1]))
+
+    def filter_tiled(
+        self, image_data: np.ndarray, tile_shape: Optional[Tuple[int, int]] = None, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Filters large images tile by tile (overlap-save) so that peak memory is bounded by the tile size rather
+        than by the image size.
 
-        # remove complex leakage
-        filtered_image = np.real(filtered_image)
+        Each tile is extended by the spatial support of the kernel on every side, filtered on its own small FFT grid
+        and only its uncontaminated center is written to `out`. The kernel is sampled exactly on the tile grid (see
+        `get_grid_kernel`) as in `filter`, so the result agrees with it up to the kernel truncation implied by
+        `truncate`.
 
-        return filtered_image
+        Args:
+            image_data (np.ndarray): (n, m) image data, can be a read-only np.memmap
+            tile_shape (Tuple[int, int], optional): Shape of the tiles. Defaults to `get_tile_shape`.
+            out (np.ndarray, optional): Preallocated (n, m) output, e.g. a writable np.memmap. Defaults to None.
+
+        Returns:
+            np.ndarray: (n, m) filtered image data, i.e. `out` if it was given
+        """
+        # assert image_data has valid shape
+        if len(image_data.shape) != 2:
+            raise ValueError(f"image data must have shape (n, m). Got {image_data.shape}")
+
+        n, m = image_data.shape
+        if out is None:
+            out = np.empty((n, m), dtype=self.dtype)
+        elif out.shape != (n, m):
+            raise ValueError(f"out must have shape {(n, m)}. Got {out.shape}")
+
+        # kernels without compact support reach over the whole image, tiling cannot help with those
+        support = self.spatial_support()
+        if support >= max(n, m):
+            return self.filter(image_data, out=out)
+
+        tile_n, tile_m = tile_shape or self.get_tile_shape((n, m))
+
+        # each tile is padded by the support on both sides, so the center is free of wrap-around
+        grid_shape = (next_fast_len(tile_n + 2 * support), next_fast_len(tile_m + 2 * support))
+        workspace = workspace_pool.get(grid_shape, self.dtype)
+        tile_buffer = workspace.padded_data
+        fft = self.fft
+
+        for i in range(0, n, tile_n):
+            for j in range(0, m, tile_m):
+                # tile including its surrounding, zero outside of the image
+                top, left = max(0, i - support), max(0, j - support)
+                bottom, right = min(n, i + tile_n + support), min(m, j + tile_m + support)
+
+                tile_buffer.fill(0)
+                tile_buffer[top - i + support : bottom - i + support, left - j + support : right - j + support] = (
+                    image_data[top:bottom, left:right]
+                )
+
+                # filter tile
+                fft_data = fft.rfft2(tile_buffer, out=workspace.fft_data)
+                self.apply_kernel(fft_data, grid_shape)
+                filtered_tile = fft.irfft2(fft_data, grid_shape, out=tile_buffer, overwrite_input=True)
+
+                # only keep the center
+                rows, columns = min(tile_n, n - i), min(tile_m, m - j)
+                center = filtered_tile[support : support + rows, support : support + columns]
+                _store(out, (slice(i, i + rows), slice(j, j + columns)), center)
+
+        return out
+
+    def filter_array(
+        self,
+        source: Union[np.ndarray, str, Path],
+        output_path: Optional[Union[str, Path]] = None,
+        dtype: np.dtype = np.float64,
+    ) -> np.ndarray:
+        """Filters raw greyscale data without going through PIL, e.g. for huge or reused images kept as .npy files.
+
+        The data is filtered tile by tile (see `filter_tiled`), so memory-mapped input is only read tile-wise and
+        results are written straight into a memory-mapped .npy output without materialising extra copies.
+
+        Args:
+            source (Union[np.ndarray, str, Path]): (n, m) array, np.memmap or path to a .npy file (opened read-only
+                as memory map)
+            output_path (Union[str, Path], optional): .npy file the result is written to via np.memmap. Defaults to
+                None, i.e. the result is returned in memory.
+            dtype (np.dtype, optional): dtype of the result. Integer types are rounded and clipped. Defaults to
+                np.float64.
+
+        Returns:
+            np.ndarray: (n, m) filtered data, a np.memmap of `output_path` if given
+        """
+        image_data = np.load(source, mmap_mode="r") if isinstance(source, (str, Path)) else source
+
+        # assert image_data has valid shape
+        if len(image_data.shape) != 2:
+            raise ValueError(f"image data must have shape (n, m). Got {image_data.shape}")
+
+        if output_path is None:
+            out = np.empty(image_data.shape, dtype=dtype)
+        else:
+            out = np.lib.format.open_memmap(output_path, mode="w+", dtype=dtype, shape=image_data.shape)
+
+        self.filter_tiled(image_data, out=out)
+
+        if isinstance(out, np.memmap):
+            out.flush()
+
+        return out
 
     def __call__(self, image: Image) -> Image:
+        return self.filter_image(image)
+
+    def filter_image(self, image: Image) -> Image:
+        """Filters the greyscale version of `image` and returns the result as RGBA image to allow blending."""
 
         # get image greyness data
         grey_scale_image = image.convert("L")
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+FaceLocation = Tuple[int, int, int, int]  # (top, right, bottom, left)
+
+
+class FaceLocationCache:
+    """
+    Cache for detected face locations, keyed by a hash of the decoded pixel data and the detector settings. Entries
+    are kept in an in-memory LRU and, if a `path` is given, persisted in a sqlite database so that detection is skipped
+    for images that have been seen before, even across processes.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[Union[str, Path]] = None):
+        self.max_entries = max_entries
+        self.path = path
+
+        self._entries: "OrderedDict[str, List[FaceLocation]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_data: np.ndarray, settings: Hashable = ()) -> str:
+        """Content hash of the image data (including its shape and dtype) and the detector settings."""
+        image_data = np.ascontiguousarray(image_data)
+
+        digest = hashlib.sha256()
+        digest.update(repr((image_data.shape, image_data.dtype.str, settings)).encode())
+        digest.update(image_data.data)
+
+        return digest.hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path))
+        connection.execute("CREATE TABLE IF NOT EXISTS face_locations (key TEXT PRIMARY KEY, locations TEXT)")
+        return connection
+
+    def get(self, key: str) -> Optional[List[FaceLocation]]:
+        """Returns the cached face locations or None if the image has not been seen before."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        # fall back to the on-disk store
+        if self.path is not None:
+            with self._connect() as connection:
+                row = connection.execute("SELECT locations FROM face_locations WHERE key = ?", (key,)).fetchone()
+            connection.close()
+
+            if row is not None:
+                locations = [tuple(location) for location in json.loads(row[0])]
+                self._remember(key, locations)
+                with self._lock:
+                    self.hits += 1
+                return locations
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, locations: List[FaceLocation]):
+        locations = [tuple(int(side) for side in location) for location in locations]
+        self._remember(key, locations)
+
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO face_locations (key, locations) VALUES (?, ?)",
+                    (key, json.dumps(locations)),
+                )
+            connection.close()
+
+    def _remember(self, key: str, locations: List[FaceLocation]):
+        with self._lock:
+            self._entries[key] = locations
+            self._entries.move_to_end(key)
+
+            # drop least recently used entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Clears the in-memory tier. The on-disk store is left untouched."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def __getstate__(self) -> Dict:
+        # locks cannot be pickled (e.g. when sending face filters to worker processes). The in-memory tier is per
+        # process anyway, so only the configuration travels
+        return {"max_entries": self.max_entries, "path": self.path}
+
+    def __setstate__(self, state: Dict):
+        self.__init__(**state)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# cache shared by all face filters
+face_location_cache = FaceLocationCache()
@@ -1,9 +1,35 @@
+import threading
+from contextlib import nullcontext
+from typing import ContextManager, Dict, List, Optional, Tuple
+
 import numpy as np
-from face_recognition import face_locations
 from PIL import Image
 
 from hybrid_face import console
 from hybrid_face.filters.base import Filter
+from hybrid_face.filters.face_cache import (
+    FaceLocation,
+    FaceLocationCache,
+    face_location_cache,
+)
+
+CropBox = Tuple[int, int, int, int]  # (left, top, right, bottom)
+
+
+def face_locations(image_data: np.ndarray, **kwargs) -> List[FaceLocation]:
+    """Wrapper around `face_recognition.face_locations`. Importing face_recognition loads dlib and its models which
+    is slow, so we only do so once faces actually need to be detected."""
+    from face_recognition import face_locations as _face_locations
+
+    return _face_locations(image_data, **kwargs)
+
+
+def status(message: str) -> ContextManager:
+    """Spinner shown while filtering. Calls from other threads, e.g. the workers of an asyncio service (see
+    `hybrid_face.async_api`), run without one, a spinner per worker only garbles the output."""
+    if threading.current_thread() is not threading.main_thread():
+        return nullcontext()
+    return console.status(message)
 
 
 class FaceFilter(Filter):
@@ -16,71 +42,293 @@ class FaceFilter(Filter):
     def __name__(self) -> str:
         return "face-aware FFT filter"
 
-    def __call__(self, image: Image, min_aspect_ratio: float = None) -> Image:
-        with console.status(f"Applying {self.__name__} to [bold]{image.filename}"):
-            # get image greyness array
-            grey_scale_image = image.convert("L")
-            image_data = np.asarray(grey_scale_image)
-
-            # detect faces
-            face_loc = face_locations(image_data)
-
-            # make sure there is only one face
-            if len(face_loc) == 0:
-                raise ValueError(f"Cannot find face in {image.filename}")
-            elif len(face_loc) > 1:
-                raise NotImplementedError(f"Found more than one face in {image.filename}")
-
-            # get face location and image size (distances of the sides from their corresponding image border)
-            top, right, bottom, left = face_loc[0]
-            width, height = grey_scale_image.size
-
-            # detected face size
-            delta_y = abs(bottom - top)
-            delta_x = abs(right - left)
-            console.log(
-                f"Detected a {delta_x} x {delta_y} face with an aspect ratio of ",
-                f"{round(delta_y / delta_x, 2)} located at {face_loc[0]}",
+    detectors = ("hog", "cnn")
+
+    # how to pick the face of images showing several: "single" insists on exactly one, "largest" takes the one with
+    # the largest box and "central" the one closest to the center of the image
+    face_policies = ("single", "largest", "central")
+
+    # crops are zero-padded to multiples of this many pixels, so faces of similar size share a batched fft
+    bucket_length: int = 64
+
+    def __init__(
+        self,
+        sigma: float = 0.0015,
+        padding: str = "double",
+        engine: str = "fft",
+        precision: str = "float64",
+        fft_backend: Optional[str] = None,
+        fft_workers: Optional[int] = None,
+        detection_max_side: Optional[int] = None,
+        detection_scale: Optional[float] = None,
+        detector: str = "hog",
+        upsample: int = 1,
+        face_cache: Optional[FaceLocationCache] = face_location_cache,
+    ):
+        """
+        Args:
+            sigma (float, optional): The soft cut-off frequency of the filter. Defaults to 0.0015.
+            padding (str, optional): Padding policy, see `Filter`. Defaults to "double".
+            engine (str, optional): Filtering engine, see `Filter`. Defaults to "fft".
+            precision (str, optional): "float32" or "float64" working precision, see `Filter`. Defaults to "float64".
+            fft_backend (str, optional): Name of the fft library, see `Filter`. Defaults to None.
+            fft_workers (int, optional): Threads per fft, see `Filter`. Defaults to None.
+            detection_max_side (int, optional): Detect faces on a copy downscaled such that its longer side is at most
+                this many pixels. Defaults to None, i.e. no limit.
+            detection_scale (float, optional): Detect faces on a copy downscaled by this factor. Defaults to None.
+            detector (str, optional): face_recognition model, "hog" (fast) or "cnn" (accurate). Defaults to "hog".
+            upsample (int, optional): How often the detector upsamples the image to find smaller faces. Defaults to 1.
+            face_cache (FaceLocationCache, optional): Cache for detected face locations. Defaults to the shared
+                in-memory `face_location_cache`. Pass None to always run the detector.
+        """
+        super().__init__(sigma, padding, engine, precision, fft_backend, fft_workers)
+
+        if detector not in self.detectors:
+            raise ValueError(f"detector must be one of {self.detectors}. Got {detector}")
+        if detection_scale is not None and not 0 < detection_scale <= 1:
+            raise ValueError(f"detection_scale must be in (0, 1]. Got {detection_scale}")
+
+        self.detection_max_side = detection_max_side
+        self.detection_scale = detection_scale
+        self.detector = detector
+        self.upsample = upsample
+        self.face_cache = face_cache
+
+    def get_detection_scale(self, image_size: Tuple[int, int]) -> float:
+        """Factor by which an image of size (width, height) is downscaled before detecting faces."""
+        scale = 1.0 if self.detection_scale is None else self.detection_scale
+
+        if self.detection_max_side is not None:
+            scale = min(scale, self.detection_max_side / max(image_size))
+
+        return scale
+
+    def locate_faces(self, image: Image) -> List[FaceLocation]:
+        """Detects all faces in `image` and returns their (top, right, bottom, left) boxes in full resolution."""
+        grey_scale_image = image.convert("L")
+        width, height = grey_scale_image.size
+        scale = self.get_detection_scale(grey_scale_image.size)
+
+        # skip detection entirely for images we have seen before
+        if self.face_cache is not None:
+            cache_key = self.face_cache.make_key(np.asarray(grey_scale_image), (scale, self.detector, self.upsample))
+            face_locs = self.face_cache.get(cache_key)
+            if face_locs is not None:
+                return list(face_locs)
+
+        # detect on a downscaled copy if wanted, this is by far the most expensive step for large photos
+        if scale < 1:
+            detection_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            grey_scale_image = grey_scale_image.resize(detection_size, Image.BILINEAR, reducing_gap=2.0)
+
+        image_data = np.asarray(grey_scale_image)
+        face_locs = face_locations(image_data, number_of_times_to_upsample=self.upsample, model=self.detector)
+
+        # map boxes back to full resolution
+        x_scale, y_scale = width / grey_scale_image.size[0], height / grey_scale_image.size[1]
+        face_locs = [
+            (
+                max(0, round(top * y_scale)),
+                min(width, round(right * x_scale)),
+                min(height, round(bottom * y_scale)),
+                max(0, round(left * x_scale)),
             )
+            for top, right, bottom, left in face_locs
+        ]
+
+        if self.face_cache is not None:
+            self.face_cache.put(cache_key, face_locs)
+
+        return face_locs
+
+    def locate_face(self, image: Image) -> FaceLocation:
+        """Same as `locate_faces` but makes sure that there is exactly one face."""
+        face_locs = self.locate_faces(image)
+
+        # make sure there is only one face
+        if len(face_locs) == 0:
+            raise ValueError(f"Cannot find face in {image.filename}")
+        elif len(face_locs) > 1:
+            raise ValueError(
+                f"Found {len(face_locs)} faces in {image.filename}. Pick one via face_policy (--face-policy) "
+                '"largest" or "central", or merge all of them pairwise via "pair"'
+            )
+
+        return face_locs[0]
+
+    def select_face(self, image: Image, policy: str = "single") -> FaceLocation:
+        """Detects the faces in `image` and picks one according to `policy`, one of `face_policies`."""
+        if policy not in self.face_policies:
+            raise ValueError(f"policy must be one of {self.face_policies}. Got {policy}")
+
+        if policy == "single":
+            return self.locate_face(image)
+
+        face_locs = self.locate_faces(image)
+        if len(face_locs) == 0:
+            raise ValueError(f"Cannot find face in {image.filename}")
 
-            # the rectangle returned by face_recognition is a bit too tight. So we extend the rectangle
-            crop_top = max(0, top - delta_y * 0.8)
-            crop_bottom = min(height, bottom + delta_y * 0.2)
-            crop_right = min(width, right + delta_x * 0.3)
-            crop_left = max(0, left - delta_x * 0.3)
+        if policy == "largest":
+            return max(face_locs, key=lambda location: (location[2] - location[0]) * (location[1] - location[3]))
 
-            # if we want the face cutout to have a certain aspect ration
-            if min_aspect_ratio is not None:
+        # distance of the center of the box to the center of the image
+        width, height = image.size
+        return min(
+            face_locs,
+            key=lambda location: np.hypot(
+                (location[1] + location[3] - width) / 2, (location[0] + location[2] - height) / 2
+            ),
+        )
 
-                crop_delta_y = abs(crop_bottom - crop_top)
-                crop_delta_x = abs(crop_right - crop_left)
+    def face_box(
+        self, image_size: Tuple[int, int], face_location: FaceLocation, min_aspect_ratio: float = None
+    ) -> CropBox:
+        """(left, top, right, bottom) box of the crop around the face at `face_location` in an image of size (width,
+        height), see `crop_face`."""
+        # get face location and image size (distances of the sides from their corresponding image border)
+        top, right, bottom, left = face_location
+        width, height = image_size
 
-                min_y = int(crop_delta_x * min_aspect_ratio)
+        # detected face size
+        delta_y = abs(bottom - top)
+        delta_x = abs(right - left)
+        console.log(
+            f"Detected a {delta_x} x {delta_y} face with an aspect ratio of ",
+            f"{round(delta_y / delta_x, 2)} located at {face_location}",
+        )
 
-                if crop_delta_y < min_y:
+        # the rectangle returned by face_recognition is a bit too tight. So we extend the rectangle
+        crop_top = max(0, top - delta_y * 0.8)
+        crop_bottom = min(height, bottom + delta_y * 0.2)
+        crop_right = min(width, right + delta_x * 0.3)
+        crop_left = max(0, left - delta_x * 0.3)
 
-                    # pixels needed to match aspect ratio
-                    padding = int(min_y - crop_delta_x)
-                    crop_top = max(0, top - padding // 2)
-                    crop_bottom = min(height, bottom + padding // 2)
-                    console.log(
-                        f"The face has an aspect ratio of {delta_y / delta_x} but it is requested to be at least",
-                        f"{min_aspect_ratio}. After padding we achieve an aspect ratio of ",
-                        f"{round((crop_bottom - crop_top) / crop_delta_x, 2)}",
-                    )
+        # if we want the face cutout to have a certain aspect ration
+        if min_aspect_ratio is not None:
 
-            # convert to (x1, y1, x2, y2) coords
-            crop_loc = (crop_left, crop_top, crop_right, crop_bottom)
+            crop_delta_y = abs(crop_bottom - crop_top)
+            crop_delta_x = abs(crop_right - crop_left)
 
+            min_y = int(crop_delta_x * min_aspect_ratio)
+
+            if crop_delta_y < min_y:
+
+                # pixels needed to match aspect ratio
+                padding = int(min_y - crop_delta_x)
+                crop_top = max(0, top - padding // 2)
+                crop_bottom = min(height, bottom + padding // 2)
+                console.log(
+                    f"The face has an aspect ratio of {delta_y / delta_x} but it is requested to be at least",
+                    f"{min_aspect_ratio}. After padding we achieve an aspect ratio of ",
+                    f"{round((crop_bottom - crop_top) / crop_delta_x, 2)}",
+                )
+
+        # convert to (x1, y1, x2, y2) coords
+        return tuple(int(round(side)) for side in (crop_left, crop_top, crop_right, crop_bottom))
+
+    def crop_face(
+        self, image: Image, min_aspect_ratio: float = None, face_location: Optional[FaceLocation] = None
+    ) -> Image:
+        """Detects the face in `image` and returns the greyscale crop around it.
+
+        Args:
+            image (Image): PIL.Image instance containing exactly one face
+            min_aspect_ratio (float, optional): Minimal height / width ratio of the crop. Defaults to None.
+            face_location (FaceLocation, optional): Previously detected (top, right, bottom, left) box of the face.
+                Defaults to None, in which case the face is detected.
+
+        Returns:
+            Image: greyscale PIL.Image of the facial region
+        """
+        grey_scale_image = image.convert("L")
+
+        # detect face
+        if face_location is None:
+            face_location = self.locate_face(image)
+
+        return grey_scale_image.crop(self.face_box(grey_scale_image.size, face_location, min_aspect_ratio))
+
+    def crop_faces(
+        self, image: Image, face_locations: Optional[List[FaceLocation]] = None
+    ) -> List[Tuple[Image, CropBox]]:
+        """Returns the greyscale crops around all faces in `image` (see `crop_face`) together with their boxes.
+
+        Args:
+            image (Image): PIL.Image instance
+            face_locations (List[FaceLocation], optional): Previously detected faces. Defaults to None, in which case
+                all faces are detected.
+
+        Returns:
+            List[Tuple[Image, CropBox]]: crop and (left, top, right, bottom) box of each face
+        """
+        grey_scale_image = image.convert("L")
+
+        if face_locations is None:
+            face_locations = self.locate_faces(image)
+
+        boxes = [self.face_box(grey_scale_image.size, face_location) for face_location in face_locations]
+        return [(grey_scale_image.crop(box), box) for box in boxes]
+
+    def filter_crops(self, crops: List[Image]) -> List[Image]:
+        """Filters many (face) crops, batching those of similar size.
+
+        Each crop is zero-padded to the next multiple of `bucket_length` on both sides, so all crops of a bucket are
+        filtered by a single batched fft (see `filter_batch`). As the fft engine zero-pads anyway, this matches
+        filtering each crop on its own up to the sampling of the kernel on the slightly larger grid.
+
+        Args:
+            crops (List[Image]): PIL.Image instances of arbitrary sizes
+
+        Returns:
+            List[Image]: filtered RGBA images, in the order of `crops`
+        """
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for index, crop in enumerate(crops):
+            width, height = crop.size
+            bucket_shape = tuple(-(-length // self.bucket_length) * self.bucket_length for length in (height, width))
+            buckets.setdefault(bucket_shape, []).append(index)
+
+        filtered_crops = [None] * len(crops)
+        for bucket_shape, indices in buckets.items():
+            batch_data = np.zeros((len(indices), *bucket_shape), dtype=self.dtype)
+            for batch_index, index in enumerate(indices):
+                crop_data = np.asarray(crops[index].convert("L"))
+                batch_data[batch_index, : crop_data.shape[0], : crop_data.shape[1]] = crop_data
+
+            filtered_data = self.filter_batch(batch_data)
+
+            for batch_index, index in enumerate(indices):
+                width, height = crops[index].size
+                crop_data = np.ascontiguousarray(filtered_data[batch_index, :height, :width])
+                filtered_crops[index] = Image.fromarray(crop_data).convert("RGBA")
+
+        return filtered_crops
+
+    def filter_faces(self, image: Image) -> List[Tuple[Image, CropBox]]:
+        """Filters all faces in `image` (see `crop_faces` and `filter_crops`).
+
+        Args:
+            image (Image): PIL.Image instance showing any number of faces
+
+        Returns:
+            List[Tuple[Image, CropBox]]: filtered RGBA crop and (left, top, right, bottom) box of each face
+        """
+        with status(f"Applying {self.__name__} to all faces in [bold]{image.filename}"):
+            faces = self.crop_faces(image)
+            console.log(f"Applying {self.__name__} to {len(faces)} cropped facial regions")
+            filtered_crops = self.filter_crops([crop for crop, _ in faces])
+
+            return [(filtered_crop, box) for filtered_crop, (_, box) in zip(filtered_crops, faces)]
+
+    def __call__(self, image: Image, min_aspect_ratio: float = None) -> Image:
+        with status(f"Applying {self.__name__} to [bold]{image.filename}"):
             # crop and apply filter
-            face_image = grey_scale_image.crop(crop_loc)
-            face_data = np.asarray(face_image)
+            face_image = self.crop_face(image, min_aspect_ratio)
             console.log(f"Applying {self.__name__} to cropped facial region")
-            filtered_face_data = self.filter(face_data)
+            filtered_face_image = self.filter_image(face_image)
 
             console.print(f"[green] Finished processing [bold]{image.filename}")
-            # return data as rgba to allow blending
-            return Image.fromarray(filtered_face_data).convert("RGBA")
+            return filtered_face_image
 
 
 class LowPassFaceFilter(FaceFilter):
@@ -91,11 +339,19 @@ class LowPassFaceFilter(FaceFilter):
     def kernel_function(self, xx: np.ndarray, yy: np.ndarray) -> np.ndarray:
         return np.exp(-0.5 * (xx ** 2 + yy ** 2) / (self.sigma + self.epsilon))
 
+    def kernel_factor(self, x_range: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * x_range ** 2 / (self.sigma + self.epsilon))
+
 
 class HighPassFaceFilter(FaceFilter):
     @property
     def __name__(self) -> str:
         return "face-aware high-pass filter"
 
+    complement = True
+
     def kernel_function(self, xx: np.ndarray, yy: np.ndarray) -> np.ndarray:
         return 1 - np.exp(-0.5 * (xx ** 2 + yy ** 2) / (self.sigma + self.epsilon))
+
+    def kernel_factor(self, x_range: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * x_range ** 2 / (self.sigma + self.epsilon))
@@ -0,0 +1,236 @@
+import atexit
+import os
+import pickle
+import threading
+import warnings
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Type
+
+import numpy as np
+
+# defaults of the fft backend used by all filters that do not choose one themselves
+FFT_BACKEND = os.environ.get("HYBRID_FACE_FFT_BACKEND", "numpy")
+FFT_WORKERS = int(os.environ.get("HYBRID_FACE_FFT_WORKERS", 0)) or None
+
+# where pyFFTW persists its plans (wisdom) between processes
+FFTW_WISDOM_PATH = Path(
+    os.environ.get("HYBRID_FACE_FFTW_WISDOM", Path.home() / ".cache" / "hybrid_face" / "fftw_wisdom.pickle")
+)
+
+# numpy's transforms accept output buffers since numpy 2.0
+NUMPY_FFT_OUT = np.lib.NumpyVersion(np.__version__) >= "2.0.0"
+
+
+def next_fast_len(target: int) -> int:
+    """Returns the smallest 5-smooth integer (i.e. of the form 2^a 3^b 5^c) that is at least `target`. FFTs of such
+    lengths are considerably faster than those of lengths with large prime factors."""
+    if target <= 6:
+        return max(target, 1)
+
+    best = 2 * target
+    power_of_5 = 1
+    while power_of_5 < best:
+        power_of_35 = power_of_5
+        while power_of_35 < best:
+            # smallest power of two that gets us to the target
+            length = power_of_35
+            while length < target:
+                length *= 2
+            best = min(best, length)
+            power_of_35 *= 3
+        power_of_5 *= 5
+
+    return best
+
+
+class FFTBackend(ABC):
+    """
+    Real 2D FFTs over the last two axes. Backends wrap an FFT library and are registered in `fft_backends` under
+    their name. Optional libraries are only imported once a backend using them is created.
+    """
+
+    name: str = "abstract"
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers (int, optional): Number of threads used per transform. Defaults to None, i.e. one per CPU.
+                Backends without multi-threading ignore it.
+        """
+        self.workers = workers or os.cpu_count() or 1
+
+    @abstractmethod
+    def rfft2(self, data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Half-plane spectrum (..., P, Q // 2 + 1) of the real (..., P, Q) data. Backends that support it write the
+        spectrum into `out`, always use the returned array."""
+
+    @abstractmethod
+    def irfft2(
+        self,
+        fft_data: np.ndarray,
+        shape: Tuple[int, int],
+        out: Optional[np.ndarray] = None,
+        overwrite_input: bool = False,
+    ) -> np.ndarray:
+        """Inverse of `rfft2` for data of shape (..., *shape). Backends that support it write the result into `out`
+        and, if `overwrite_input` is set, may use `fft_data` as scratch space; always use the returned array."""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(workers={self.workers})"
+
+
+class NumpyFFTBackend(FFTBackend):
+    """numpy's pocketfft, always available but single-threaded."""
+
+    name = "numpy"
+
+    def rfft2(self, data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if out is None or not NUMPY_FFT_OUT:
+            return np.fft.rfft2(data)
+        return np.fft.rfft2(data, out=out)
+
+    def irfft2(
+        self,
+        fft_data: np.ndarray,
+        shape: Tuple[int, int],
+        out: Optional[np.ndarray] = None,
+        overwrite_input: bool = False,
+    ) -> np.ndarray:
+        if out is None or not NUMPY_FFT_OUT or not overwrite_input or fft_data.shape[-2] != shape[0]:
+            return np.fft.irfft2(fft_data, s=shape)
+
+        # irfft2 allocates a full complex temporary for its first pass, transforming the columns in place avoids it
+        np.fft.ifft(fft_data, axis=-2, out=fft_data)
+        return np.fft.irfft(fft_data, n=shape[1], axis=-1, out=out)
+
+
+class ScipyFFTBackend(FFTBackend):
+    """scipy.fft, which splits batched and multidimensional transforms across `workers` threads."""
+
+    name = "scipy"
+
+    def __init__(self, workers: Optional[int] = None):
+        super().__init__(workers)
+        import scipy.fft
+
+        self._fft = scipy.fft
+
+    def rfft2(self, data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        return self._fft.rfft2(data, workers=self.workers)
+
+    def irfft2(
+        self,
+        fft_data: np.ndarray,
+        shape: Tuple[int, int],
+        out: Optional[np.ndarray] = None,
+        overwrite_input: bool = False,
+    ) -> np.ndarray:
+        return self._fft.irfft2(fft_data, s=shape, overwrite_x=overwrite_input, workers=self.workers)
+
+
+class PyFFTWBackend(FFTBackend):
+    """pyFFTW with `workers` threads. Plans are cached in memory and their wisdom is persisted in `wisdom_path`, so
+    the expensive planning happens once per shape rather than once per process."""
+
+    name = "pyfftw"
+
+    # wisdom is global to the FFTW library, so it is only loaded once and written back when the process exits
+    _wisdom_lock = threading.Lock()
+    _wisdom_loaded = False
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        planner_effort: str = "FFTW_MEASURE",
+        wisdom_path: Optional[Path] = FFTW_WISDOM_PATH,
+    ):
+        super().__init__(workers)
+        import pyfftw
+        import pyfftw.interfaces.numpy_fft
+
+        self._pyfftw = pyfftw
+        self._fft = pyfftw.interfaces.numpy_fft
+        self.planner_effort = planner_effort
+        self.wisdom_path = wisdom_path
+
+        # keep plans of recently used shapes alive between calls
+        pyfftw.interfaces.cache.enable()
+
+        if wisdom_path is not None:
+            self._load_wisdom()
+
+    def _load_wisdom(self):
+        with self._wisdom_lock:
+            if PyFFTWBackend._wisdom_loaded:
+                return
+            PyFFTWBackend._wisdom_loaded = True
+
+            if self.wisdom_path.exists():
+                with open(self.wisdom_path, "rb") as wisdom_file:
+                    self._pyfftw.import_wisdom(pickle.load(wisdom_file))
+
+            atexit.register(self.save_wisdom)
+
+    def save_wisdom(self):
+        """Writes the wisdom of all plans created so far to `wisdom_path`."""
+        self.wisdom_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.wisdom_path, "wb") as wisdom_file:
+            pickle.dump(self._pyfftw.export_wisdom(), wisdom_file)
+
+    def rfft2(self, data: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        return self._fft.rfft2(data, threads=self.workers, planner_effort=self.planner_effort)
+
+    def irfft2(
+        self,
+        fft_data: np.ndarray,
+        shape: Tuple[int, int],
+        out: Optional[np.ndarray] = None,
+        overwrite_input: bool = False,
+    ) -> np.ndarray:
+        return self._fft.irfft2(
+            fft_data,
+            s=shape,
+            overwrite_input=overwrite_input,
+            threads=self.workers,
+            planner_effort=self.planner_effort,
+        )
+
+
+fft_backends: Dict[str, Type[FFTBackend]] = {
+    backend.name: backend for backend in (NumpyFFTBackend, ScipyFFTBackend, PyFFTWBackend)
+}
+
+
+def register_fft_backend(backend: Type[FFTBackend]):
+    """Makes `backend` available under its name, e.g. for `get_fft_backend` and the `fft_backend` of filters."""
+    fft_backends[backend.name] = backend
+    _create_fft_backend.cache_clear()
+
+
+def unregister_fft_backend(name: str):
+    """Inverse of `register_fft_backend`, also drops the backends created under `name`."""
+    del fft_backends[name]
+    _create_fft_backend.cache_clear()
+
+
+def get_fft_backend(name: Optional[str] = None, workers: Optional[int] = None) -> FFTBackend:
+    """Returns the (shared) fft backend `name` using `workers` threads. Both default to the environment variables
+    HYBRID_FACE_FFT_BACKEND and HYBRID_FACE_FFT_WORKERS. Backends whose library is not installed fall back to numpy
+    with a warning.
+    """
+    name = name or FFT_BACKEND
+    if name not in fft_backends:
+        raise ValueError(f"fft backend must be one of {tuple(fft_backends)}. Got {name}")
+
+    return _create_fft_backend(name, workers or FFT_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def _create_fft_backend(name: str, workers: Optional[int]) -> FFTBackend:
+    try:
+        return fft_backends[name](workers)
+    except ImportError as error:
+        warnings.warn(f"fft backend {name} is not available ({error}), falling back to numpy")
+        return NumpyFFTBackend(workers)
@@ -11,11 +11,19 @@ class LowPassFilter(Filter):
     def kernel_function(self, xx: np.ndarray, yy: np.ndarray) -> np.ndarray:
         return np.exp(-0.5 * (xx ** 2 + yy ** 2) / (self.sigma + self.epsilon))
 
+    def kernel_factor(self, x_range: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * x_range ** 2 / (self.sigma + self.epsilon))
+
 
 class HighPassFilter(Filter):
     @property
     def __name__(self) -> str:
         return "high-pass filter"
 
+    complement = True
+
     def kernel_function(self, xx: np.ndarray, yy: np.ndarray) -> np.ndarray:
         return 1 - np.exp(-0.5 * (xx ** 2 + yy ** 2) / (self.sigma + self.epsilon))
+
+    def kernel_factor(self, x_range: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * x_range ** 2 / (self.sigma + self.epsilon))
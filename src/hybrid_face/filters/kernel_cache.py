@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from hybrid_face.filters.kernel_store import Kernel, KernelStore, kernel_store
+
+# default memory budget of the shared kernel cache, can be overwritten via environment variable
+DEFAULT_MAX_BYTES = int(os.environ.get("HYBRID_FACE_KERNEL_CACHE_BYTES", 256 * 1024 ** 2))
+
+
+def kernel_nbytes(kernel: Kernel) -> int:
+    if isinstance(kernel, tuple):
+        return sum(array.nbytes for array in kernel)
+    return kernel.nbytes
+
+
+def _freeze(kernel: Kernel) -> Kernel:
+    # cached kernels are shared between filters so nobody is allowed to modify them in place
+    for array in kernel if isinstance(kernel, tuple) else (kernel,):
+        array.flags.writeable = False
+    return kernel
+
+
+class KernelCache:
+    """
+    Thread-safe LRU cache for filter kernels that is bounded by the number of bytes it holds rather than the number of
+    entries. Keys are plain tuples such as (filter class, sigma, shape, ...) so, unlike `functools.lru_cache` on
+    methods, the cache never keeps filter instances alive. On a miss, kernels are looked up in the on-disk `store`
+    (if any) before they are computed.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, store: Optional[KernelStore] = None):
+        self._entries: "OrderedDict[Hashable, Kernel]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._max_bytes = max_bytes
+        self.store = store
+
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int):
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key: Hashable, factory: Callable[[], Kernel]) -> Kernel:
+        """Returns the kernel stored under `key`. On a miss, the kernel is created by calling `factory` and stored."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # build (or load) kernel outside of the lock. Worst case two threads build the same kernel
+        kernel = _freeze(factory() if self.store is None else self.store.get(key, factory))
+        nbytes = kernel_nbytes(kernel)
+
+        with self._lock:
+            # kernels larger than the whole budget are never cached
+            if nbytes > self._max_bytes:
+                return kernel
+
+            if key not in self._entries:
+                self._entries[key] = kernel
+                self.current_bytes += nbytes
+                self._evict()
+
+        return kernel
+
+    def _evict(self):
+        # drop least recently used kernels until we are within budget
+        while self.current_bytes > self._max_bytes and self._entries:
+            _, kernel = self._entries.popitem(last=False)
+            self.current_bytes -= kernel_nbytes(kernel)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss/eviction counters and the memory usage of the cache, e.g. for exporting as metrics."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# cache shared by all filters
+kernel_cache = KernelCache(store=kernel_store)
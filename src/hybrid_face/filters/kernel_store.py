@@ -0,0 +1,108 @@
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+Kernel = Union[np.ndarray, Tuple[np.ndarray, ...]]
+
+# directory of precomputed kernels, the store is disabled unless set
+KERNEL_STORE_PATH = os.environ.get("HYBRID_FACE_KERNEL_STORE")
+
+
+def key_name(key: Hashable) -> str:
+    """File name of a kernel key such as (filter class, sigma, epsilon, shape, kind, precision)."""
+    names = []
+    for part in key if isinstance(key, tuple) else (key,):
+        if isinstance(part, type):
+            names.append(f"{part.__module__}.{part.__qualname__}")
+        elif isinstance(part, tuple):
+            names.append("x".join(str(value) for value in part))
+        else:
+            names.append(str(part))
+
+    return re.sub(r"[^\w.+=-]", "_", "-".join(names))
+
+
+class KernelStore:
+    """
+    Directory of precomputed kernels, one .npy file per kernel (or a directory of them for kernels made of several
+    arrays, e.g. separable factors), named after the kernel key. Stored kernels are memory-mapped read-only, so
+    processes using the same store share their pages through the OS page cache rather than each computing and holding
+    their own copy. Missing kernels are computed as usual and, unless the store is `read_only`, written to it.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = KERNEL_STORE_PATH, read_only: bool = True):
+        self.path = path
+        self.read_only = read_only
+
+        self.hits = 0
+        self.misses = 0
+
+    def file_path(self, key: Hashable, is_tuple: bool = False) -> Path:
+        """.npy file of the kernel stored under `key`, or the directory of .npy files if it is a tuple of arrays."""
+        name = key_name(key)
+        return Path(self.path) / (name if is_tuple else f"{name}.npy")
+
+    def load(self, key: Hashable) -> Optional[Kernel]:
+        """Memory-maps the kernel stored under `key` or returns None if there is none (or it cannot be read)."""
+        try:
+            file_path = self.file_path(key)
+            if file_path.exists():
+                return np.load(file_path, mmap_mode="r")
+
+            directory_path = self.file_path(key, is_tuple=True)
+            if directory_path.is_dir():
+                parts = sorted(directory_path.glob("*.npy"), key=lambda part: int(part.stem))
+                return tuple(np.load(part, mmap_mode="r") for part in parts)
+        except (OSError, ValueError):
+            pass
+
+        return None
+
+    def save(self, key: Hashable, kernel: Kernel):
+        """Writes the kernel to the store. Kernels are written to a temporary file first and then moved into place, so
+        concurrent readers never see partially written kernels."""
+        file_path = self.file_path(key, is_tuple=isinstance(kernel, tuple))
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if isinstance(kernel, tuple):
+            temporary_path = Path(tempfile.mkdtemp(dir=file_path.parent))
+            for index, array in enumerate(kernel):
+                np.save(temporary_path / f"{index}.npy", array)
+
+            try:
+                os.rename(temporary_path, file_path)
+            except OSError:
+                # another process stored the same kernel in the meantime
+                shutil.rmtree(temporary_path)
+            return
+
+        file_descriptor, temporary_name = tempfile.mkstemp(dir=file_path.parent, suffix=".npy")
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            np.save(temporary_file, kernel)
+        os.replace(temporary_name, file_path)
+
+    def get(self, key: Hashable, factory: Callable[[], Kernel]) -> Kernel:
+        """Returns the stored kernel or creates it by calling `factory`. Without a `path`, this is just `factory()`."""
+        if self.path is None:
+            return factory()
+
+        kernel = self.load(key)
+        if kernel is not None:
+            self.hits += 1
+            return kernel
+
+        self.misses += 1
+        kernel = factory()
+        if not self.read_only:
+            self.save(key, kernel)
+
+        return kernel
+
+
+# store shared by all filters, enabled by setting its path
+kernel_store = KernelStore()
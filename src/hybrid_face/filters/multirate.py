@@ -0,0 +1,56 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def decimate(image_data: np.ndarray, factor: int) -> np.ndarray:
+    """Averages blocks of `factor` x `factor` pixels of the last two axes, (..., n, m) -> (..., ceil(n / factor),
+    ceil(m / factor)). The image is zero outside of its borders, as for the zero-padded fft."""
+    n, m = image_data.shape[-2:]
+    rows, columns = -(-n // factor), -(-m // factor)
+
+    if (n, m) != (rows * factor, columns * factor):
+        padded_data = np.zeros((*image_data.shape[:-2], rows * factor, columns * factor), dtype=image_data.dtype)
+        padded_data[..., :n, :m] = image_data
+        image_data = padded_data
+
+    # sum the rows of each block, then the columns. Adding strided views is much faster than reducing a reshaped array
+    row_sums = image_data[..., 0::factor, :].copy()
+    for offset in range(1, factor):
+        row_sums += image_data[..., offset::factor, :]
+
+    block_sums = row_sums[..., 0::factor].copy()
+    for offset in range(1, factor):
+        block_sums += row_sums[..., offset::factor]
+
+    block_sums *= 1 / factor ** 2
+    return block_sums
+
+
+def interpolate(image_data: np.ndarray, shape: Tuple[int, int], factor: int) -> np.ndarray:
+    """Inverse of `decimate`, linearly interpolates the last two axes of `image_data` to `shape`. Each decimated pixel
+    sits at the center of its block, pixels beyond the outermost centers take the value of the closest one."""
+    for axis, length in zip((-2, -1), shape):
+        # position of the full resolution pixels in decimated pixels
+        positions = (np.arange(length) + 0.5) / factor - 0.5
+        lower = np.floor(positions)
+        weights = np.where(positions < 0, 0, positions - lower).astype(image_data.dtype)
+
+        last = image_data.shape[axis] - 1
+        lower = np.clip(lower.astype(int), 0, last)
+        upper = np.minimum(lower + 1, last)
+
+        weights_shape = [1] * image_data.ndim
+        weights_shape[axis] = length
+        weights = weights.reshape(weights_shape)
+
+        lower_data, upper_data = np.take(image_data, lower, axis=axis), np.take(image_data, upper, axis=axis)
+        image_data = lower_data + weights * (upper_data - lower_data)
+
+    return image_data
+
+
+def resampling_variance(factor: int) -> float:
+    """Variance (in full resolution pixels^2) of the blur added by `decimate` followed by `interpolate`, i.e. of a box
+    of `factor` pixels, (factor^2 - 1) / 12, plus that of a triangle spanning two blocks, (factor^2 - 1) / 6."""
+    return (factor ** 2 - 1) / 4
@@ -0,0 +1,133 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# 5-tap binomial approximation of a gaussian with unit variance
+BINOMIAL_TAPS = np.array([1, 4, 6, 4, 1]) / 16
+
+
+def pyramid_variance(levels: int) -> float:
+    """Variance (in pixels^2) of the blur of a gaussian pyramid level expanded back to full resolution. Reducing and
+    expanding each blur with unit variance at the resolution of their level, i.e. 2 (1 + 4 + ... + 4^(L - 1))."""
+    return 2 * (4 ** levels - 1) / 3
+
+
+def levels_for_std(spatial_std: float) -> int:
+    """Largest number of pyramid levels whose blur does not exceed a gaussian with standard deviation `spatial_std`
+    (in pixels)."""
+    return max(0, int(np.floor(np.log(1.5 * spatial_std ** 2 + 1) / np.log(4))))
+
+
+def gaussian_taps(variance: float) -> np.ndarray:
+    """Normalised taps of a discrete gaussian with the given variance (in pixels^2)."""
+    # sampling narrow gaussians underestimates their variance, three taps can match it exactly
+    if variance < 0.5:
+        return np.array([variance / 2, 1 - variance, variance / 2])
+
+    # cover three standard deviations
+    std = np.sqrt(variance)
+    radius = int(np.ceil(3 * std))
+    taps = np.exp(-0.5 * (np.arange(-radius, radius + 1) / std) ** 2)
+
+    return taps / taps.sum()
+
+
+def blur(image_data: np.ndarray, taps: np.ndarray = BINOMIAL_TAPS) -> np.ndarray:
+    """Convolves the last two axes of `image_data` with the symmetric `taps`, reflecting at the borders. The result
+    has the (floating point) dtype of `image_data`."""
+    radius = len(taps) // 2
+    taps = taps.astype(image_data.dtype)
+
+    for axis in (-2, -1):
+        length = image_data.shape[axis]
+        padding = [(0, 0)] * image_data.ndim
+        padding[axis] = (radius, radius)
+        padded_data = np.pad(image_data, padding, mode="symmetric")
+
+        blurred_data = np.zeros_like(image_data)
+        for offset, tap in enumerate(taps):
+            index = [slice(None)] * image_data.ndim
+            index[axis] = slice(offset, offset + length)
+            blurred_data += tap * padded_data[tuple(index)]
+
+        image_data = blurred_data
+
+    return image_data
+
+
+def reduce(image_data: np.ndarray) -> np.ndarray:
+    """Next coarser pyramid level, (..., n, m) -> (..., ceil(n / 2), ceil(m / 2))."""
+    return blur(image_data)[..., ::2, ::2]
+
+
+def expand(image_data: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """Inverse of `reduce`, upsamples the last two axes of `image_data` to `shape` (at most twice as large)."""
+    upsampled_data = np.zeros((*image_data.shape[:-2], *shape), dtype=image_data.dtype)
+    upsampled_data[..., ::2, ::2] = image_data
+
+    # only every fourth pixel carries data, which the interpolating blur has to make up for
+    return 4 * blur(upsampled_data)
+
+
+def gaussian_pyramid(image_data: np.ndarray, levels: int) -> List[np.ndarray]:
+    """Returns the image followed by `levels` successively reduced copies of it. Integer images are converted to
+    double precision."""
+    image_data = np.asarray(image_data)
+    if not np.issubdtype(image_data.dtype, np.floating):
+        image_data = image_data.astype(float)
+
+    pyramid = [image_data]
+
+    for _ in range(levels):
+        pyramid.append(reduce(pyramid[-1]))
+
+    return pyramid
+
+
+def laplacian_pyramid(image_data: np.ndarray, levels: int) -> List[np.ndarray]:
+    """Returns the `levels` band-pass images of the image, finest first, followed by the coarsest gaussian level.
+    Collapsing (see `collapse`) restores the image exactly."""
+    pyramid = gaussian_pyramid(image_data, levels)
+
+    bands = [finer - expand(coarser, finer.shape[-2:]) for finer, coarser in zip(pyramid, pyramid[1:])]
+    return bands + [pyramid[-1]]
+
+
+def collapse(pyramid: List[np.ndarray]) -> np.ndarray:
+    """Inverse of `laplacian_pyramid`."""
+    image_data = pyramid[-1]
+
+    for band in reversed(pyramid[:-1]):
+        image_data = band + expand(image_data, band.shape[-2:])
+
+    return image_data
+
+
+def pyramid_low_pass(image_data: np.ndarray, spatial_std: float) -> np.ndarray:
+    """Gaussian low-pass of the (..., n, m) image data computed on an image pyramid in O(nm).
+
+    The image is reduced by as many levels as fit into the blur (see `levels_for_std`), the remaining variance is
+    added by a small gaussian blur on the coarsest level and the result is expanded back to full resolution. The
+    corresponding high-pass, i.e. the sum of the laplacian bands, is the image minus this.
+
+    Args:
+        image_data (np.ndarray): (..., n, m) image data
+        spatial_std (float): standard deviation of the gaussian in full resolution pixels
+
+    Returns:
+        np.ndarray: (..., n, m) low-pass filtered image data
+    """
+    levels = levels_for_std(spatial_std)
+    pyramid = gaussian_pyramid(image_data, levels)
+
+    # blur of the pyramid falls short of the wanted one by less than one level. Variances add up and a pixel of the
+    # coarsest level spans 2^levels pixels
+    residual_variance = (spatial_std ** 2 - pyramid_variance(levels)) / 4 ** levels
+    low_pass_data = pyramid[-1]
+    if residual_variance > 0:
+        low_pass_data = blur(low_pass_data, gaussian_taps(residual_variance))
+
+    for finer in reversed(pyramid[:-1]):
+        low_pass_data = expand(low_pass_data, finer.shape[-2:])
+
+    return low_pass_data
@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# default memory budget of the workspaces of each thread, can be overwritten via environment variable
+DEFAULT_MAX_BYTES = int(os.environ.get("HYBRID_FACE_WORKSPACE_BYTES", 256 * 1024 ** 2))
+
+
+class Workspace:
+    """
+    Reusable buffers for filtering (..., P, Q) zero-padded data in the frequency domain: the padded real data (which
+    also receives the inverse transform) and its (..., P, Q // 2 + 1) spectrum.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], dtype: np.dtype = np.float64):
+        self.padded_data = np.zeros(shape, dtype=dtype)
+        self.fft_data = np.empty((*shape[:-1], shape[-1] // 2 + 1), dtype=np.result_type(dtype, np.complex64))
+
+    def load(self, image_data: np.ndarray) -> np.ndarray:
+        """Copies the (..., n, m) image data into the top left corner of the zeroed padded buffer and returns it."""
+        n, m = image_data.shape[-2:]
+
+        # the buffer is reused (e.g. for inverse transforms), so the padding has to be cleared every time
+        self.padded_data[..., n:, :] = 0
+        self.padded_data[..., :n, m:] = 0
+        np.copyto(self.padded_data[..., :n, :m], image_data, casting="unsafe")
+
+        return self.padded_data
+
+    @property
+    def nbytes(self) -> int:
+        return self.padded_data.nbytes + self.fft_data.nbytes
+
+
+class WorkspacePool:
+    """
+    Per-thread LRU of workspaces keyed by shape and dtype, bounded by the number of bytes each thread holds. Filtering
+    many equally sized images therefore reuses the same buffers instead of allocating several full-size temporaries
+    per call. Workspaces are never shared between threads, so concurrent filters cannot overwrite each others data.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _workspaces(self) -> "OrderedDict[Tuple, Workspace]":
+        if not hasattr(self._local, "workspaces"):
+            self._local.workspaces = OrderedDict()
+        return self._local.workspaces
+
+    def get(self, shape: Tuple[int, ...], dtype: np.dtype = np.float64) -> Workspace:
+        """Returns the calling thread's workspace for (..., P, Q) padded data of the given dtype. Workspaces larger
+        than the whole budget are created but not kept."""
+        workspaces = self._workspaces()
+        key = (tuple(shape), np.dtype(dtype).str)
+
+        workspace: Optional[Workspace] = workspaces.get(key)
+        with self._lock:
+            if workspace is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if workspace is None:
+            workspace = Workspace(shape, dtype)
+            workspaces[key] = workspace
+
+        workspaces.move_to_end(key)
+
+        # drop least recently used workspaces
+        while workspaces and sum(workspace.nbytes for workspace in workspaces.values()) > self.max_bytes:
+            workspaces.popitem(last=False)
+            with self._lock:
+                self.evictions += 1
+
+        return workspace
+
+    def clear(self):
+        """Releases the workspaces of the calling thread."""
+        self._workspaces().clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counts of all threads, entries and bytes of the calling thread."""
+        workspaces = self._workspaces()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(workspaces),
+                "bytes": sum(workspace.nbytes for workspace in workspaces.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._workspaces())
+
+
+# workspaces shared by all filters
+workspace_pool = WorkspacePool()
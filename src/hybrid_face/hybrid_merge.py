@@ -1,13 +1,219 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional, Tuple, TypeVar, Union
+
+import numpy as np
 from PIL import Image, ImageOps
 
 from hybrid_face import console
 from hybrid_face.filters import (
+    FaceFilter,
+    Filter,
     HighPassFaceFilter,
     HighPassFilter,
     LowPassFaceFilter,
     LowPassFilter,
 )
 
+T = TypeVar("T")
+
+# besides picking one face per image (see `FaceFilter.face_policies`), "pair" merges all faces pairwise
+face_policies = FaceFilter.face_policies + ("pair",)
+
+
+def fused_blend(
+    low_pass_filter: Filter,
+    high_pass_filter: Filter,
+    low_image: Image,
+    high_image: Image,
+    alpha: float = 0.5,
+    crop_margin: int = 15,
+) -> Image:
+    """Filters and alpha-blends two equally sized greyscale images in the frequency domain.
+
+    Since the fourier transform is linear, (1 - alpha) * L * F1 + alpha * H * F2 can be formed on the spectra directly
+    so only a single inverse transform is needed and no intermediate filtered images are materialised. Note that,
+    unlike blending the filtered images, the high-pass result is not clipped to [0, 255] before blending.
+
+    Args:
+        low_pass_filter (Filter): Filter applied to `low_image`
+        high_pass_filter (Filter): Filter applied to `high_image`
+        low_image (Image): PIL.Image instance that will become the blurred image
+        high_image (Image): PIL.Image instance of the same size that will become the sharp image
+        alpha (float, optional): The alpha blending parameter. Defaults to 0.5.
+        crop_margin (int, optional): How many pixles to cut-off from the margin after blending. Defaults to 15.
+
+    Returns:
+        Image: PIL.Image instance of the blended result image
+    """
+    if low_image.size != high_image.size:
+        raise ValueError(f"images must have the same size. Got {low_image.size} and {high_image.size}")
+
+    low_data = np.asarray(low_image.convert("L"))
+    high_data = np.asarray(high_image.convert("L"))
+    image_shape = low_data.shape
+
+    # both spectra have to live on the same grid, one that is large enough for either kernel
+    low_padded_shape = low_pass_filter.get_padded_shape(image_shape)
+    high_padded_shape = high_pass_filter.get_padded_shape(image_shape)
+    padded_shape = tuple(max(lengths) for lengths in zip(low_padded_shape, high_padded_shape))
+
+    # filter and blend in the frequency domain
+    fft_data = low_pass_filter.transform(low_data, padded_shape)
+    low_pass_filter.apply_kernel(fft_data, padded_shape)
+    fft_data *= 1 - alpha
+
+    high_fft_data = high_pass_filter.transform(high_data, padded_shape)
+    high_pass_filter.apply_kernel(high_fft_data, padded_shape)
+    high_fft_data *= alpha
+    fft_data += high_fft_data
+
+    # single inverse transform for both images
+    blended_data = low_pass_filter.inverse_transform(fft_data, image_shape, padded_shape)
+
+    # remove convolution artifacts on border
+    blended_image = Image.fromarray(blended_data).convert("RGBA")
+    return ImageOps.crop(blended_image, crop_margin)
+
+
+def limit_size(image: Image, max_size: Optional[int]) -> Image:
+    """Downscales `image` so that its longer side is at most `max_size` pixels, keeping its aspect ratio and filename.
+
+    JPEG files that have not been loaded yet are decoded at a reduced scale (see `PIL.Image.Image.draft`), which skips
+    most of the decoding work for large photos. Drafting changes the image it is applied to, so the file is opened
+    again for it and `image` itself is left untouched. The decoded image is then resized to the exact size.
+
+    Args:
+        image (Image): PIL.Image instance
+        max_size (int, optional): Maximal number of pixels on the longer side. None keeps the image as is.
+
+    Returns:
+        Image: `image` if it is small enough, a downscaled copy otherwise
+    """
+    if max_size is None or max(image.size) <= max_size:
+        return image
+
+    filename = getattr(image, "filename", "")
+    scale = max_size / max(image.size)
+    size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+
+    if image.format == "JPEG" and image.tile and filename:
+        # the decoder picks the smallest of its scales (1/2, 1/4 or 1/8) that still covers `size`
+        with Image.open(filename) as draft_image:
+            draft_image.draft(None, size)
+            image = draft_image.resize(size, Image.LANCZOS)
+    else:
+        image = image.resize(size, Image.LANCZOS)
+
+    # filenames are used for logging
+    image.filename = filename
+    return image
+
+
+def run_branches(executor: Optional[Executor], low_task: Callable[[], T], high_task: Callable[[], T]) -> Tuple[T, T]:
+    """Runs the independent low-pass and high-pass branch tasks, concurrently if an executor is given.
+
+    Args:
+        executor (Executor, optional): thread or process executor, tasks run one after the other if None
+        low_task (Callable): task of the low-pass branch
+        high_task (Callable): task of the high-pass branch
+
+    Returns:
+        Tuple: results of the low-pass and high-pass task, in that order
+    """
+    if executor is None:
+        return low_task(), high_task()
+
+    low_future = executor.submit(low_task)
+    high_future = executor.submit(high_task)
+    return low_future.result(), high_future.result()
+
+
+def merge_face_pairs(
+    low_pass_face_filter: FaceFilter,
+    high_pass_face_filter: FaceFilter,
+    image1: Image,
+    image2: Image,
+    alpha: float = 0.5,
+    crop_margin: int = 15,
+    fused: bool = False,
+    executor: Optional[Executor] = None,
+) -> List[Image]:
+    """Creates one hybrid face for each pair of faces in the two images. Faces are paired from left to right, surplus
+    faces of the image showing more are ignored. The faces of each image are filtered together, batching those of
+    similar size (see `FaceFilter.filter_crops`).
+
+    Args:
+        low_pass_face_filter (FaceFilter): Filter applied to the faces of `image1`
+        high_pass_face_filter (FaceFilter): Filter applied to the faces of `image2`
+        image1 (Image): PIL.Image instance whose faces will become the blurred faces
+        image2 (Image): PIL.Image instance whose faces will become the sharp faces
+        alpha (float, optional): The alpha blending parameter. Defaults to 0.5.
+        crop_margin (int, optional): How many pixles to cut-off from the margin before blending. Defaults to 15.
+        fused (bool, optional): Whether to filter and blend each pair in the frequency domain (see `fused_blend`).
+            Defaults to False.
+        executor (Executor, optional): Executor to run the branches of both images on. Defaults to None.
+
+    Returns:
+        List[Image]: PIL.Image instances of the blended faces, from left to right
+    """
+    console.rule("[bold red]Step 2 - Crop Faces")
+    low_face_locations, high_face_locations = run_branches(
+        executor,
+        partial(low_pass_face_filter.locate_faces, image1),
+        partial(high_pass_face_filter.locate_faces, image2),
+    )
+
+    # pair faces from left to right
+    pairs = min(len(low_face_locations), len(high_face_locations))
+    if pairs == 0:
+        raise ValueError(f"Cannot find faces in both {image1.filename} and {image2.filename}")
+    console.log(
+        f"Found {len(low_face_locations)} faces in {image1.filename} and {len(high_face_locations)} faces in "
+        f"{image2.filename}, merging {pairs} pairs."
+    )
+    low_face_locations = sorted(low_face_locations, key=lambda location: location[3])[:pairs]
+    high_face_locations = sorted(high_face_locations, key=lambda location: location[3])[:pairs]
+
+    low_faces = [face for face, _ in low_pass_face_filter.crop_faces(image1, low_face_locations)]
+    high_faces = [
+        high_pass_face_filter.crop_face(image2, low_face.size[1] / low_face.size[0], face_location)
+        for low_face, face_location in zip(low_faces, high_face_locations)
+    ]
+
+    if fused:
+        console.rule("[bold red]Step 3 - Filter and Blend Faces")
+        return [
+            fused_blend(
+                low_pass_face_filter,
+                high_pass_face_filter,
+                low_face,
+                ImageOps.pad(high_face, low_face.size),
+                alpha,
+                crop_margin,
+            )
+            for low_face, high_face in zip(low_faces, high_faces)
+        ]
+
+    console.rule("[bold red]Step 3 - Apply Filters")
+    low_faces, high_faces = run_branches(
+        executor,
+        partial(low_pass_face_filter.filter_crops, low_faces),
+        partial(high_pass_face_filter.filter_crops, high_faces),
+    )
+
+    console.rule("[bold red]Step 4 - Blend Faces")
+    hybrid_faces = []
+    for low_face, high_face in zip(low_faces, high_faces):
+        # remove convolution artifacts on border and fit high face onto low face
+        low_face = ImageOps.crop(low_face, crop_margin)
+        high_face = ImageOps.crop(high_face, crop_margin)
+        high_face = ImageOps.pad(high_face, low_face.size).convert("L").convert("RGBA")
+
+        hybrid_faces.append(Image.blend(low_face, high_face, alpha))
+
+    return hybrid_faces
+
 
 def hybrid_merge(
     image1: Image,
@@ -16,7 +222,18 @@ def hybrid_merge(
     alpha=0.5,
     ignore_faces: bool = False,
     crop_margin: int = 15,
-) -> Image:
+    fused: bool = False,
+    detection_max_side: Optional[int] = None,
+    detector: str = "hog",
+    concurrent: bool = False,
+    executor: Optional[Executor] = None,
+    engine: str = "fft",
+    precision: str = "float64",
+    fft_backend: Optional[str] = None,
+    fft_workers: Optional[int] = None,
+    max_working_size: Optional[int] = None,
+    face_policy: str = "single",
+) -> Union[Image, List[Image]]:
     """Creates the hybrid image of the two provided images.
 
     Args:
@@ -26,19 +243,85 @@ def hybrid_merge(
         alpha (float, optional): The alpha blending parameter used to blend the two filtered images. Defaults to 0.5.
         ignore_faces (bool, optional): Whether to not crop for faces. Defaults to False.
         crop_margin (int, optional): How many pixles to cut-off from the margin before blending. Defaults to 15.
+        fused (bool, optional): Whether to resize the images to a common size first and then filter and blend them
+            in the frequency domain using a single inverse FFT (see `fused_blend`). Defaults to False.
+        detection_max_side (int, optional): Detect faces on copies downscaled to at most this many pixels on the
+            longer side. Defaults to None, i.e. detect in full resolution.
+        detector (str, optional): Face detection model, "hog" or "cnn". Defaults to "hog".
+        concurrent (bool, optional): Whether to run face detection and filtering of both images concurrently on a
+            thread pool. The result is identical to the sequential one. Defaults to False.
+        executor (Executor, optional): Thread or process executor to run both branches on. Implies `concurrent`.
+            Defaults to None.
+        engine (str, optional): Filtering engine, "fft", "direct", "auto", "pyramid" or "multirate" (see `Filter`).
+            The pyramid engine builds the blurred image from a gaussian pyramid and the sharp one from laplacian
+            bands, the multirate engine computes the low-pass on a decimated copy of the image. Both are considerably
+            faster for large images. Fused blending always filters in the frequency domain. Defaults to "fft".
+        precision (str, optional): Working precision of the filters, "float32" halves memory traffic and kernel cache
+            size at a negligible loss of accuracy for 8-bit images. Defaults to "float64".
+        fft_backend (str, optional): FFT library, "numpy", "scipy" or "pyfftw" (see `hybrid_face.filters.fft`).
+            Defaults to None, i.e. the HYBRID_FACE_FFT_BACKEND environment variable or numpy.
+        fft_workers (int, optional): Threads per FFT for the scipy and pyfftw backends. Defaults to None, i.e. the
+            HYBRID_FACE_FFT_WORKERS environment variable or one per CPU.
+        max_working_size (int, optional): Downscale both images to at most this many pixels on the longer side
+            before anything else (see `limit_size`), so decoding and filtering cost scale with the output rather than
+            the input resolution. Sigma is relative to the pixels filtered, so the hybrid looks like one made from
+            images of that size. Defaults to None, i.e. work in full resolution.
+        face_policy (str, optional): How to deal with images showing several faces, one of `face_policies`.
+            "single" requires exactly one face per image, "largest" and "central" pick one face of each image (see
+            `FaceFilter.select_face`) and "pair" merges all faces pairwise (see `merge_face_pairs`). Ignored together
+            with `ignore_faces`. Defaults to "single".
 
     Returns:
-        Image: PIL.Image instance of the blended result image
+        Union[Image, List[Image]]: PIL.Image instance of the blended result image, or one for each pair of faces if
+            `face_policy` is "pair"
     """
+    if face_policy not in face_policies:
+        raise ValueError(f"face_policy must be one of {face_policies}. Got {face_policy}")
+
+    # reduce the images only once, the concurrent call below gets the reduced ones
+    image1, image2 = limit_size(image1, max_working_size), limit_size(image2, max_working_size)
+
+    if concurrent and executor is None:
+        # numpy's FFT and dlib release the GIL for most of their work, so threads suffice
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return hybrid_merge(
+                image1,
+                image2,
+                sigma,
+                alpha,
+                ignore_faces,
+                crop_margin,
+                fused,
+                detection_max_side,
+                detector,
+                executor=executor,
+                engine=engine,
+                precision=precision,
+                fft_backend=fft_backend,
+                fft_workers=fft_workers,
+                face_policy=face_policy,
+            )
+
+    if ignore_faces and fused:
+        # bring both images to a common size before filtering
+        low_image = image1.convert("L")
+        high_image = ImageOps.pad(image2.convert("L"), low_image.size)
+
+        filter_kwargs = dict(precision=precision, fft_backend=fft_backend, fft_workers=fft_workers)
+        low_pass_filter = LowPassFilter(sigma, **filter_kwargs)
+        high_pass_filter = HighPassFilter(sigma, **filter_kwargs)
+        return fused_blend(low_pass_filter, high_pass_filter, low_image, high_image, alpha, crop_margin)
 
     if ignore_faces:
         # initiate filters
-        low_pass_filter = LowPassFilter(sigma)
-        high_pass_filter = HighPassFilter(sigma)
+        filter_kwargs = dict(engine=engine, precision=precision, fft_backend=fft_backend, fft_workers=fft_workers)
+        low_pass_filter = LowPassFilter(sigma, **filter_kwargs)
+        high_pass_filter = HighPassFilter(sigma, **filter_kwargs)
 
         # apply filters
-        low_image = low_pass_filter(image1)
-        high_image = high_pass_filter(image2)
+        low_image, high_image = run_branches(
+            executor, partial(low_pass_filter, image1), partial(high_pass_filter, image2)
+        )
 
         # remove convolution artifacts on border
         console.log(f"Removing {crop_margin} px from each side to avoid convolution artifacts")
@@ -47,8 +330,8 @@ def hybrid_merge(
 
         # resize/pad high face to fit onto to low face
         console.log(
-            f"resizing {high_image.filename} from {high_image.size} to {low_image.size} \
-             to so it can be merged with {low_image.filename}"
+            f"resizing {image2.filename} from {high_image.size} to {low_image.size} \
+             to so it can be merged with {image1.filename}"
         )
         high_image = ImageOps.pad(high_image, low_image.size).convert("L").convert("RGBA")
 
@@ -57,19 +340,62 @@ def hybrid_merge(
 
     # initate filters
     console.rule("[bold red]Step 1 - Initiate Filters")
-    low_pass_face_filter = LowPassFaceFilter(sigma)
+    face_filter_kwargs = dict(
+        engine=engine,
+        precision=precision,
+        fft_backend=fft_backend,
+        fft_workers=fft_workers,
+        detection_max_side=detection_max_side,
+        detector=detector,
+    )
+    low_pass_face_filter = LowPassFaceFilter(sigma, **face_filter_kwargs)
     console.log(f"Initiated [bold]{low_pass_face_filter.__name__} (σ = {low_pass_face_filter.sigma}).")
-    high_pass_face_filter = HighPassFaceFilter(sigma)
+    high_pass_face_filter = HighPassFaceFilter(sigma, **face_filter_kwargs)
     console.log(f"Initiated [bold]{high_pass_face_filter.__name__} (σ = {high_pass_face_filter.sigma}).")
 
-    # get faces and apply filter
-    console.rule("[bold red]Step 2 - Apply Filters")
-    low_face = low_pass_face_filter(image1)
+    if face_policy == "pair":
+        return merge_face_pairs(
+            low_pass_face_filter, high_pass_face_filter, image1, image2, alpha, crop_margin, fused, executor
+        )
+
+    # detect faces. Only cropping the high face depends on the low face (via its aspect ratio), so the expensive
+    # detection can run for both images at once
+    console.rule("[bold red]Step 2 - Crop Faces")
+    low_face_location, high_face_location = run_branches(
+        executor,
+        partial(low_pass_face_filter.select_face, image1, face_policy),
+        partial(high_pass_face_filter.select_face, image2, face_policy),
+    )
+    low_face = low_pass_face_filter.crop_face(image1, face_location=low_face_location)
     low_face_aspect_ratio = low_face.size[1] / low_face.size[0]
-    high_face = high_pass_face_filter(image2, min_aspect_ratio=low_face_aspect_ratio)
+    high_face = high_pass_face_filter.crop_face(
+        image2, min_aspect_ratio=low_face_aspect_ratio, face_location=high_face_location
+    )
+
+    if fused:
+        # bring faces to a common size before filtering
+        console.log(
+            f"Resize face in {image2.filename} from {high_face.size} to {low_face.size}",
+            f"so it matches the dimensions of the face in {image1.filename}.",
+        )
+        high_face = ImageOps.pad(high_face, low_face.size)
+
+        # filter and merge in the frequency domain
+        console.rule("[bold red]Step 3 - Filter and Blend Faces")
+        console.log(f"Blending the filtered faces from {image1.filename} and {image2.filename} together.")
+        return fused_blend(low_pass_face_filter, high_pass_face_filter, low_face, high_face, alpha, crop_margin)
+
+    # apply filters
+    console.rule("[bold red]Step 3 - Apply Filters")
+    console.log(f"Applying {low_pass_face_filter.__name__} and {high_pass_face_filter.__name__} to the faces.")
+    low_face, high_face = run_branches(
+        executor,
+        partial(low_pass_face_filter.filter_image, low_face),
+        partial(high_pass_face_filter.filter_image, high_face),
+    )
 
     # remove convolution artifacts on border
-    console.rule("[bold red]Step 3 - Cosmetic Adjustments")
+    console.rule("[bold red]Step 4 - Cosmetic Adjustments")
     console.log(f"Removing {crop_margin} px from each side to avoid convolution artifacts.")
     high_face = ImageOps.crop(high_face, crop_margin)
     low_face = ImageOps.crop(low_face, crop_margin)
@@ -82,6 +408,6 @@ def hybrid_merge(
     high_face = ImageOps.pad(high_face, low_face.size).convert("L").convert("RGBA")
 
     # merge images
-    console.rule("[bold red]Step 4 - Blend Faces")
+    console.rule("[bold red]Step 5 - Blend Faces")
     console.log(f"Blending the filtered faces from {image1.filename} and {image2.filename} together.")
     return Image.blend(low_face, high_face, alpha)
@@ -30,3 +30,18 @@ def face_image_data(face_image: Image) -> np.ndarray:
 @fixture(params=face_filters)
 def face_filter(request, sigma: float) -> FaceFilter:
     return request.param(sigma)
+
+
+@fixture
+def group_image() -> Image:
+    # all sample faces side by side
+    faces = [Image.open(face_file).convert("RGB") for face_file in sorted(sample_face_files)]
+    group_image = Image.new("RGB", (sum(face.size[0] for face in faces), max(face.size[1] for face in faces)), "white")
+
+    left = 0
+    for face in faces:
+        group_image.paste(face, (left, 0))
+        left += face.size[0]
+
+    group_image.filename = "group.png"
+    return group_image
@@ -0,0 +1,67 @@
+import pickle
+
+import numpy as np
+from PIL import Image
+
+from hybrid_face.filters import FaceLocationCache, LowPassFaceFilter, face_filters
+
+
+def test_face_cache_keys():
+    image_data = np.random.randint(0, 256, (20, 30), dtype=np.uint8)
+    key = FaceLocationCache.make_key(image_data, ("hog", 1))
+
+    assert key == FaceLocationCache.make_key(image_data.copy(), ("hog", 1))
+    assert key != FaceLocationCache.make_key(image_data, ("cnn", 1))
+    assert key != FaceLocationCache.make_key(image_data.T, ("hog", 1))
+
+
+def test_face_cache_lru():
+    cache = FaceLocationCache(max_entries=2)
+    for key in "abc":
+        cache.put(key, [(1, 2, 3, 4)])
+
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == [(1, 2, 3, 4)]
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 2}
+
+
+def test_face_cache_is_persisted(tmp_path):
+    path = tmp_path / "faces.sqlite"
+    FaceLocationCache(path=path).put("a", [(1, 2, 3, 4), (5, 6, 7, 8)])
+
+    # a fresh cache (e.g. in another process) finds the entry on disk
+    assert FaceLocationCache(path=path).get("a") == [(1, 2, 3, 4), (5, 6, 7, 8)]
+    assert FaceLocationCache(path=path).get("b") is None
+
+
+def test_face_filter_skips_detection_for_known_images(monkeypatch):
+    calls = []
+
+    def fake_face_locations(image_data, **kwargs):
+        calls.append(image_data.shape)
+        return [(10, 40, 50, 5)]
+
+    monkeypatch.setattr(face_filters, "face_locations", fake_face_locations)
+
+    face_filter = LowPassFaceFilter(face_cache=FaceLocationCache())
+    image = Image.fromarray(np.random.randint(0, 256, (60, 50), dtype=np.uint8))
+
+    assert face_filter.locate_faces(image) == [(10, 40, 50, 5)]
+    assert face_filter.locate_faces(image) == [(10, 40, 50, 5)]
+    assert len(calls) == 1
+
+    # without a cache the detector runs every time
+    LowPassFaceFilter(face_cache=None).locate_faces(image)
+    assert len(calls) == 2
+
+
+def test_face_cache_can_be_pickled(tmp_path):
+    cache = FaceLocationCache(max_entries=3, path=tmp_path / "faces.sqlite")
+    cache.put("a", [(1, 2, 3, 4)])
+
+    # only the configuration is sent to other processes, the on-disk tier is shared
+    unpickled_cache = pickle.loads(pickle.dumps(cache))
+    assert unpickled_cache.max_entries == 3
+    assert len(unpickled_cache) == 0
+    assert unpickled_cache.get("a") == [(1, 2, 3, 4)]
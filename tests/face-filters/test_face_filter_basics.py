@@ -1,5 +1,8 @@
+import pytest
 from PIL.Image import Image
 
+from hybrid_face.filters import HighPassFaceFilter, LowPassFaceFilter
+
 
 def test_face_filters_work(face_filter, face_image):
     filtered_face = face_filter(face_image)
@@ -12,3 +15,22 @@ def test_face_filters_work(face_filter, face_image):
     # finds face
     assert 10 < face_m <= m
     assert 10 < face_n <= n
+
+
+def test_downscaled_face_detection(face_image):
+    face_location = LowPassFaceFilter().locate_face(face_image)
+    downscaled_face_location = LowPassFaceFilter(detection_max_side=max(face_image.size) // 2).locate_face(face_image)
+
+    # boxes are mapped back to full resolution
+    top, right, bottom, left = face_location
+    tolerance = 0.25 * max(bottom - top, right - left)
+    assert all(abs(a - b) < tolerance for a, b in zip(face_location, downscaled_face_location))
+
+
+def test_detection_scale():
+    face_filter = HighPassFaceFilter(detection_max_side=500, detection_scale=0.8)
+    assert face_filter.get_detection_scale((1000, 400)) == 0.5
+    assert face_filter.get_detection_scale((400, 300)) == 0.8
+
+    with pytest.raises(ValueError):
+        HighPassFaceFilter(detector="sift")
@@ -1,6 +1,9 @@
+import numpy as np
+from PIL import Image as PILImage
 from PIL.Image import Image
+from PIL.JpegImagePlugin import JpegImageFile
 
-from hybrid_face.hybrid_merge import hybrid_merge
+from hybrid_face.hybrid_merge import hybrid_merge, limit_size
 
 
 def test_hybrid_face_merge(two_face_images, sigma):
@@ -9,3 +12,100 @@ def test_hybrid_face_merge(two_face_images, sigma):
     assert isinstance(hybrid_blend, Image)
     assert hybrid_blend.size[0] > 10
     assert hybrid_blend.size[1] > 10
+
+
+def test_fused_hybrid_face_merge(two_face_images, sigma):
+    face1, face2 = two_face_images
+    hybrid_blend = hybrid_merge(face1, face2, sigma=sigma, fused=True)
+    assert isinstance(hybrid_blend, Image)
+    assert hybrid_blend.mode == "RGBA"
+    assert hybrid_blend.size == hybrid_merge(face1, face2, sigma=sigma).size
+
+
+def test_fused_merge_matches_low_pass_branch(two_face_images):
+    face1, face2 = two_face_images
+
+    # with alpha = 0 only the low-pass branch contributes, which is identical for both modes
+    for ignore_faces in [True, False]:
+        hybrid_blend = hybrid_merge(face1, face2, alpha=0, ignore_faces=ignore_faces)
+        fused_hybrid_blend = hybrid_merge(face1, face2, alpha=0, ignore_faces=ignore_faces, fused=True)
+        assert np.abs(np.asarray(hybrid_blend, float) - np.asarray(fused_hybrid_blend, float)).mean() < 1
+
+
+def test_concurrent_merge_is_deterministic(two_face_images):
+    face1, face2 = two_face_images
+
+    for ignore_faces in [True, False]:
+        hybrid_blend = hybrid_merge(face1, face2, ignore_faces=ignore_faces)
+        concurrent_hybrid_blend = hybrid_merge(face1, face2, ignore_faces=ignore_faces, concurrent=True)
+        assert np.array_equal(np.asarray(hybrid_blend), np.asarray(concurrent_hybrid_blend))
+
+
+def test_pyramid_hybrid_face_merge(two_face_images):
+    face1, face2 = two_face_images
+
+    for ignore_faces in [True, False]:
+        hybrid_blend = hybrid_merge(face1, face2, ignore_faces=ignore_faces)
+        pyramid_hybrid_blend = hybrid_merge(face1, face2, ignore_faces=ignore_faces, engine="pyramid")
+        assert pyramid_hybrid_blend.size == hybrid_blend.size
+
+
+def test_multirate_hybrid_face_merge(two_face_images):
+    face1, face2 = two_face_images
+
+    for ignore_faces in [True, False]:
+        hybrid_blend = np.asarray(hybrid_merge(face1, face2, ignore_faces=ignore_faces), int)
+        multirate_hybrid_blend = np.asarray(hybrid_merge(face1, face2, ignore_faces=ignore_faces, engine="multirate"))
+        assert np.abs(hybrid_blend - multirate_hybrid_blend).mean() < 1
+
+
+def test_single_precision_hybrid_face_merge(two_face_images):
+    face1, face2 = two_face_images
+
+    for fused in [True, False]:
+        hybrid_blend = np.asarray(hybrid_merge(face1, face2, fused=fused), int)
+        single_precision_hybrid_blend = np.asarray(hybrid_merge(face1, face2, fused=fused, precision="float32"), int)
+        assert np.abs(hybrid_blend - single_precision_hybrid_blend).max() <= 1
+
+
+def test_limit_size_decodes_jpegs_in_draft_mode(tmp_path, monkeypatch):
+    jpeg_path = tmp_path / "large.jpg"
+    PILImage.open("tests/images/faces/gauss.png").convert("RGB").resize((1600, 1200)).save(jpeg_path)
+
+    draft_sizes = []
+    draft = JpegImageFile.draft
+
+    def recording_draft(self, mode, size):
+        result = draft(self, mode, size)
+        draft_sizes.append(self.size)
+        return result
+
+    monkeypatch.setattr(JpegImageFile, "draft", recording_draft)
+
+    image = PILImage.open(jpeg_path)
+    small_image = limit_size(image, 300)
+
+    assert small_image.size == (300, 225)
+    assert small_image.filename == str(jpeg_path)
+
+    # the jpeg was decoded at a quarter of its size rather than in full
+    assert draft_sizes == [(400, 300)]
+
+    # the image passed in is left as it was
+    assert image.size == (1600, 1200)
+    assert np.asarray(image).shape == (1200, 1600, 3)
+
+
+def test_limit_size_keeps_small_images(two_face_images):
+    face1, _ = two_face_images
+
+    assert limit_size(face1, None) is face1
+    assert limit_size(face1, max(face1.size)) is face1
+
+
+def test_max_working_size_hybrid_face_merge(two_face_images):
+    face1, face2 = two_face_images
+
+    for ignore_faces in [True, False]:
+        hybrid_blend = hybrid_merge(face1, face2, ignore_faces=ignore_faces, max_working_size=200)
+        assert max(hybrid_blend.size) <= 200
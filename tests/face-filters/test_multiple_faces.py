@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from hybrid_face.cli import save_hybrid
+from hybrid_face.filters import HighPassFaceFilter, LowPassFaceFilter
+from hybrid_face.hybrid_merge import hybrid_merge
+
+
+def test_filter_faces(group_image: Image.Image):
+    faces = LowPassFaceFilter(0.002).filter_faces(group_image)
+
+    assert len(faces) == 3
+    for face, (left, top, right, bottom) in faces:
+        assert face.mode == "RGBA"
+        assert face.size == (right - left, bottom - top)
+
+
+@pytest.mark.parametrize("face_filter_class", [LowPassFaceFilter, HighPassFaceFilter])
+def test_filter_crops_matches_filtering_each_crop(group_image: Image.Image, face_filter_class, monkeypatch):
+    face_filter = face_filter_class(0.002)
+    crops = [crop for crop, _ in face_filter.crop_faces(group_image)]
+
+    # crops of the same bucket share a single batched fft
+    crops.append(crops[0].resize((crops[0].size[0] - 1, crops[0].size[1] - 1)))
+    batch_sizes = []
+    filter_batch = face_filter.filter_batch
+
+    def counting_filter_batch(batch_data: np.ndarray) -> np.ndarray:
+        batch_sizes.append(len(batch_data))
+        return filter_batch(batch_data)
+
+    monkeypatch.setattr(face_filter, "filter_batch", counting_filter_batch)
+
+    filtered_crops = face_filter.filter_crops(crops)
+    assert sorted(batch_sizes) == [1, 1, 2]
+
+    for crop, filtered_crop in zip(crops, filtered_crops):
+        expected_data = np.asarray(face_filter.filter_image(crop), float)
+        assert np.abs(np.asarray(filtered_crop, float) - expected_data).mean() < 0.5
+
+
+def test_select_face(group_image: Image.Image):
+    face_filter = LowPassFaceFilter()
+    face_locations = face_filter.locate_faces(group_image)
+
+    def area(location):
+        top, right, bottom, left = location
+        return (bottom - top) * (right - left)
+
+    assert face_filter.select_face(group_image, "largest") == max(face_locations, key=area)
+
+    # the faces are placed side by side, so the central one is the second from the left
+    central_face_location = sorted(face_locations, key=lambda location: location[3])[1]
+    assert face_filter.select_face(group_image, "central") == central_face_location
+
+    with pytest.raises(ValueError, match="face_policy"):
+        face_filter.select_face(group_image, "single")
+
+    with pytest.raises(ValueError):
+        face_filter.select_face(group_image, "unknown")
+
+
+@pytest.mark.parametrize("face_policy", ["largest", "central"])
+def test_hybrid_merge_picks_one_face(group_image: Image.Image, two_face_images, face_policy: str):
+    face1, _ = two_face_images
+    hybrid_blend = hybrid_merge(face1, group_image, face_policy=face_policy)
+
+    assert isinstance(hybrid_blend, Image.Image)
+    assert hybrid_blend.size == hybrid_merge(face1, face1, face_policy=face_policy).size
+
+
+@pytest.mark.parametrize("fused", [True, False])
+def test_hybrid_merge_pairs_faces(group_image: Image.Image, two_face_images, fused: bool):
+    face1, _ = two_face_images
+
+    hybrid_blends = hybrid_merge(group_image, group_image, face_policy="pair", fused=fused)
+    assert len(hybrid_blends) == 3
+    assert all(hybrid_blend.mode == "RGBA" for hybrid_blend in hybrid_blends)
+
+    # surplus faces are ignored
+    assert len(hybrid_merge(face1, group_image, face_policy="pair", fused=fused)) == 1
+
+
+def test_invalid_face_policy(two_face_images):
+    with pytest.raises(ValueError):
+        hybrid_merge(*two_face_images, face_policy="unknown")
+
+
+def test_save_hybrid_faces(tmp_path):
+    hybrid_faces = [Image.new("RGBA", (10, 10)) for _ in range(2)]
+    save_hybrid(hybrid_faces, tmp_path / "out.png")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["out-1.png", "out-2.png"]
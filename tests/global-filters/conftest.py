@@ -18,3 +18,9 @@ def low_pass_filter(sigma: int) -> LowPassFilter:
 @fixture
 def random_image(random_image_data: np.ndarray) -> Image:
     return Image.fromarray(random_image_data, "L")
+
+
+@fixture
+def face_image_data() -> np.ndarray:
+    # natural images have most of their energy in the low frequencies, unlike random noise
+    return np.asarray(Image.open("tests/images/faces/gauss.png").convert("L"), dtype=float)
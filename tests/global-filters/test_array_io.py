@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from hybrid_face.filters import Filter
+
+
+@pytest.fixture
+def npy_image_path(tmp_path, random_image_data: np.ndarray):
+    path = tmp_path / "image.npy"
+    np.save(path, random_image_data.astype(np.uint8))
+    return path
+
+
+def test_filter_array_from_npy_path(global_filter: Filter, npy_image_path, tmp_path):
+    output_path = tmp_path / "filtered.npy"
+    filtered_data = global_filter.filter_array(npy_image_path, output_path)
+
+    # result is memory mapped and persisted
+    assert isinstance(filtered_data, np.memmap)
+    expected = global_filter.filter_tiled(np.load(npy_image_path))
+    assert np.allclose(np.load(output_path), expected)
+
+
+def test_filter_array_from_memmap(global_filter: Filter, npy_image_path):
+    image_data = np.load(npy_image_path, mmap_mode="r")
+    filtered_data = global_filter.filter_array(image_data)
+
+    assert filtered_data.shape == image_data.shape
+    assert np.allclose(filtered_data, global_filter.filter_tiled(np.asarray(image_data)))
+
+
+def test_filter_array_to_8_bit(global_filter: Filter, npy_image_path):
+    filtered_data = global_filter.filter_array(npy_image_path, dtype=np.uint8)
+    expected = np.clip(np.rint(global_filter.filter_tiled(np.load(npy_image_path))), 0, 255)
+
+    assert filtered_data.dtype == np.uint8
+    assert np.array_equal(filtered_data, expected)
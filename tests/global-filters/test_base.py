@@ -1,8 +1,10 @@
 from typing import Tuple
 
 import numpy as np
+import pytest
 
-from hybrid_face.filters import Filter, LowPassFilter
+from hybrid_face.filters import Filter, HighPassFilter, LowPassFilter, kernel_cache
+from hybrid_face.filters.fft import next_fast_len
 
 
 def test_initiates_properly(global_filter: Filter, sigma: float):
@@ -47,16 +49,260 @@ def test_kernel_max(low_pass_filter: LowPassFilter, image_shape: Tuple[int, int]
     # ignore zero kernels
     if kernel.sum() != 0:
 
-        # should be centered around the center of the padded image
-        assert abs(n_max - n) < 2 and abs(m_max - m) < 2
+        # should be centered around the zero frequency, i.e. the (periodic) origin
+        assert min(n_max, 2 * n - n_max) < 2 and min(m_max, 2 * m - m_max) < 2
 
 
-def test_shift_matrix(
-    global_filter: Filter,
-    random_image_data: np.ndarray,
-):
-    shift_matrix = global_filter.get_shift_matrix(random_image_data.shape)
-    assert shift_matrix.shape == (2 * random_image_data.shape[0], 2 * random_image_data.shape[1])
-    assert set(np.unique(shift_matrix)) == set([-1, 1])
-    assert shift_matrix[0, 0] == 1
-    assert shift_matrix.sum() == 0
+def test_half_plane_kernel(global_filter: Filter, image_shape: Tuple[int, int]):
+    half_kernel = global_filter.get_kernel(image_shape, half_plane=True)
+    n, m = image_shape
+
+    assert half_kernel.shape == (2 * n, m + 1)  # (2N, M + 1)
+    assert 0 <= half_kernel.min() <= half_kernel.max() <= 1
+
+
+def test_real_fft_matches_complex_fft(global_filter: Filter, random_image_data: np.ndarray):
+    n, m = random_image_data.shape
+
+    # reference implementation using the full complex spectrum and a centered kernel
+    padded_data = np.pad(random_image_data, ((0, n), (0, m)))
+    i, j = np.ogrid[0 : 2 * n, 0 : 2 * m]
+    shift_matrix = (-1) ** (i + j)
+    centered_kernel = np.fft.fftshift(global_filter.get_kernel(random_image_data.shape))
+    fft_data = np.fft.fft2(padded_data * shift_matrix) * centered_kernel
+    expected = np.real(np.fft.ifft2(fft_data) * shift_matrix)[0:n, 0:m]
+
+    assert np.allclose(global_filter.filter(random_image_data), expected)
+
+
+def test_filter_batch(global_filter: Filter, image_shape: Tuple[int, int]):
+    images = [np.random.randint(0, 256, image_shape) for _ in range(3)]
+
+    filtered_images = global_filter.filter_batch(images)
+    assert filtered_images.shape == (3, *image_shape)
+
+    # same result as filtering one by one
+    for image, filtered_image in zip(images, filtered_images):
+        assert np.allclose(global_filter.filter(image), filtered_image)
+
+    # stacked arrays are accepted as well
+    assert np.allclose(global_filter.filter_batch(np.stack(images)), filtered_images)
+
+
+def test_filter_batch_rejects_mixed_shapes(low_pass_filter: Filter):
+    with pytest.raises(ValueError):
+        low_pass_filter.filter_batch([np.zeros((10, 10)), np.zeros((10, 11))])
+
+
+@pytest.mark.parametrize("padding", ["fast", "minimal"])
+def test_padding_modes(global_filter: Filter, random_image_data: np.ndarray, padding: str):
+    padded_filter = type(global_filter)(global_filter.sigma, padding=padding)
+    n, m = random_image_data.shape
+    P, Q = padded_filter.get_padded_shape((n, m))
+
+    # never pads more than needed for a fast length and always enough to avoid wrap-around
+    assert P == next_fast_len(P) and Q == next_fast_len(Q)
+    assert min(n + padded_filter.spatial_support(), 2 * n) <= P <= next_fast_len(2 * n)
+    assert min(m + padded_filter.spatial_support(), 2 * m) <= Q <= next_fast_len(2 * m)
+
+    # the kernel is built for the padded grid
+    assert padded_filter.get_kernel((n, m)).shape == (P, Q)
+    assert padded_filter.get_kernel((n, m), half_plane=True).shape == (P, Q // 2 + 1)
+
+    filtered_image = padded_filter.filter(random_image_data)
+    assert filtered_image.shape == (n, m)
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("sigma", [0.0005, 0.002, 0.005])
+@pytest.mark.parametrize("padding", ["fast", "minimal"])
+def test_padding_modes_match_double_padding(filter_class, sigma: float, padding: str):
+    image_data = np.random.randint(0, 256, (300, 400))
+
+    # results agree with the doubling up to the wrap-around of the kernel on the smaller grids
+    filtered_image = filter_class(sigma, padding=padding).filter(image_data)
+    assert np.abs(filtered_image - filter_class(sigma).filter(image_data)).mean() < 1
+
+
+def test_invalid_padding_mode():
+    with pytest.raises(ValueError):
+        LowPassFilter(padding="triple")
+
+
+def test_next_fast_len():
+    assert next_fast_len(1) == 1
+    assert next_fast_len(7) == 8
+    assert next_fast_len(2026) == 2048
+    assert next_fast_len(1754) == 1800
+
+
+@pytest.mark.parametrize("tile_shape", [None, (7, 13), (64, 64)])
+def test_filter_tiled(global_filter: Filter, random_image_data: np.ndarray, tile_shape):
+    out = np.full(random_image_data.shape, np.nan)
+    filtered_image = global_filter.filter_tiled(random_image_data, tile_shape=tile_shape, out=out)
+
+    # writes every pixel of the preallocated output
+    assert filtered_image is out
+    assert np.isfinite(out).all()
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("sigma", [0.0005, 0.002, 0.005])
+@pytest.mark.parametrize("tile_shape", [None, (64, 96)])
+def test_filter_tiled_matches_filter(filter_class, sigma: float, tile_shape):
+    image_data = np.random.randint(0, 256, (300, 400))
+    image_filter = filter_class(sigma)
+
+    # agrees with the untiled filter up to the kernel truncation and sampling differences
+    filtered_image = image_filter.filter_tiled(image_data, tile_shape=tile_shape)
+    assert np.abs(filtered_image - image_filter.filter(image_data)).mean() < 1
+
+
+@pytest.mark.parametrize("padding", Filter.padding_modes)
+def test_filter_sigmas(random_image_data: np.ndarray, padding: str):
+    sigmas = [0.0005, 0.002, 0.005, 0.25]
+    high_pass_filter = HighPassFilter(padding=padding)
+
+    filtered_images = high_pass_filter.filter_sigmas(random_image_data, sigmas, batch_size=3)
+    assert filtered_images.shape == (len(sigmas), *random_image_data.shape)
+
+    # same as filtering with each sigma, up to the common padding
+    for sigma, filtered_image in zip(sigmas, filtered_images):
+        expected = HighPassFilter(sigma, padding=padding).filter(random_image_data)
+        if padding == "minimal":
+            assert np.abs(filtered_image - expected).mean() < 0.02 * 255
+        else:
+            assert np.allclose(filtered_image, expected)
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_kernel_factors_match_dense_kernel(global_filter: Filter, image_shape: Tuple[int, int], exact: bool):
+    padded_shape = global_filter.get_padded_shape(image_shape)
+    factors = global_filter.get_kernel_factors(padded_shape, exact)
+
+    # the (2n, 2m) grid is only sampled symmetrically by the exact sampling (or for 2 x 2 grids), otherwise the dense
+    # kernel is used
+    n, m = image_shape
+    if not exact and max(n, m) > 1:
+        assert factors is None
+        return
+
+    row_factor, column_factor = factors
+    assert row_factor.shape == (2 * n,) and column_factor.shape == (m + 1,)
+
+    separable_kernel = np.outer(row_factor, column_factor)
+    if global_filter.complement:
+        separable_kernel = 1 - separable_kernel
+
+    dense_kernel = global_filter.get_grid_kernel(padded_shape, half_plane=True, exact=exact)
+    assert np.allclose(separable_kernel, dense_kernel)
+
+
+@pytest.mark.parametrize("padded_shape", [(7, 9), (7, 8)])
+def test_kernel_factors_of_odd_linspace_grids(padded_shape: Tuple[int, int]):
+    low_pass_filter = LowPassFilter(0.05)
+    factors = low_pass_filter.get_kernel_factors(padded_shape, exact=False)
+
+    # linspace sampling is only symmetric for odd lengths
+    if padded_shape[1] % 2 == 0:
+        assert factors is None
+    else:
+        dense_kernel = low_pass_filter.get_grid_kernel(padded_shape, half_plane=True, exact=False)
+        assert np.allclose(np.outer(*factors), dense_kernel)
+
+
+@pytest.mark.parametrize("padding", ["double", "fast"])
+def test_separable_kernels_match_dense_kernels_in_batches(padding: str):
+    image_data = np.random.randint(0, 256, (3, 150, 120))
+
+    for image_filter in (LowPassFilter(0.002, padding=padding), HighPassFilter(0.002, padding=padding)):
+        padded_shape = image_filter.get_padded_shape(image_data.shape[-2:])
+        fft_data = image_filter.transform(image_data, padded_shape)
+        expected = fft_data * image_filter.get_grid_kernel(padded_shape, half_plane=True)
+
+        # small blocks, so the kernel is applied in several of them
+        image_filter.block_bytes = 4096
+        assert np.allclose(image_filter.apply_kernel(fft_data, padded_shape), expected)
+
+
+def test_separable_filter_matches_dense_filter(global_filter: Filter, random_image_data: np.ndarray):
+    padded_shape = global_filter.get_padded_shape(random_image_data.shape)
+
+    fft_data = global_filter.transform(random_image_data)
+    fft_data *= global_filter.get_grid_kernel(padded_shape, half_plane=True)
+    expected = global_filter.inverse_transform(fft_data, random_image_data.shape)
+
+    assert np.allclose(global_filter.filter(random_image_data), expected)
+
+
+def test_kernel_factors_are_compact():
+    low_pass_filter = LowPassFilter(0.002)
+    factors = low_pass_filter.get_kernel_factors((2000, 3000))
+
+    assert sum(factor.nbytes for factor in factors) == (2000 + 1501) * 8
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+def test_default_filter_caches_only_kernel_factors(filter_class, random_image_data: np.ndarray):
+    image_filter = filter_class(0.002)
+    P, Q = image_filter.get_padded_shape(random_image_data.shape)
+
+    kernel_cache.clear()
+    image_filter.filter(random_image_data)
+
+    # the default "double" padding samples the kernel symmetrically, so no dense kernel is built
+    assert kernel_cache.stats()["entries"] == 1
+    assert kernel_cache.stats()["bytes"] == (P + Q // 2 + 1) * 8
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        LowPassFilter(engine="unknown")
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("sigma", [0.0005, 0.002, 0.005, 0.02])
+def test_direct_engine_matches_fft(filter_class, sigma: float):
+    image_data = np.random.randint(0, 256, (300, 400))
+
+    direct_filter = filter_class(sigma, engine="direct")
+    assert direct_filter.choose_engine(image_data.shape) == "direct"
+
+    # documented tolerance: within a few hundredths of a grey level
+    expected = filter_class(sigma).filter(image_data)
+    assert np.abs(direct_filter.filter(image_data) - expected).max() < 0.05
+    assert np.abs(direct_filter.filter_batch(image_data[None]) - expected).max() < 0.05
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("sigma", [0.0005, 0.002, 0.005])
+@pytest.mark.parametrize("padding", ["double", "fast"])
+@pytest.mark.parametrize("image_shape", [(150, 120), (200, 160), (250, 200)])
+def test_direct_engine_matches_fft_on_face_crops(filter_class, sigma: float, padding: str, image_shape):
+    # the half-bin offset of the linspace sampling matters most on grids of face crop size
+    image_data = np.random.randint(0, 256, image_shape)
+
+    direct_filter = filter_class(sigma, padding=padding, engine="direct")
+    expected = filter_class(sigma, padding=padding).filter(image_data)
+    assert np.abs(direct_filter.filter(image_data) - expected).max() < 0.05
+
+
+def test_direct_engine_falls_back_to_fft(global_filter: Filter, random_image_data: np.ndarray):
+    direct_filter = global_filter.with_sigma(global_filter.sigma)
+    direct_filter.engine = "direct"
+
+    # kernels without compact support (or larger than the image) are always filtered in the frequency domain
+    if direct_filter.spatial_taps() is None or direct_filter.spatial_support() >= min(random_image_data.shape):
+        assert direct_filter.choose_engine(random_image_data.shape) == "fft"
+        assert np.allclose(direct_filter.filter(random_image_data), global_filter.filter(random_image_data))
+
+    if direct_filter.spatial_taps() is None:
+        with pytest.raises(ValueError):
+            direct_filter.filter_direct(random_image_data)
+
+
+def test_auto_engine():
+    # narrow spatial kernels are cheaper to apply directly, wide ones in the frequency domain
+    assert LowPassFilter(0.02, engine="auto").choose_engine((2000, 3000)) == "direct"
+    assert LowPassFilter(0.0001, engine="auto").choose_engine((2000, 3000)) == "fft"
+    assert LowPassFilter(0.02, engine="fft").choose_engine((2000, 3000)) == "fft"
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from hybrid_face.filters import HighPassFilter, LowPassFilter, fft
+from hybrid_face.filters.fft import (
+    NumpyFFTBackend,
+    get_fft_backend,
+    register_fft_backend,
+    unregister_fft_backend,
+)
+
+
+def test_numpy_backend_is_default():
+    assert isinstance(LowPassFilter().fft, NumpyFFTBackend)
+
+
+def test_invalid_fft_backend():
+    with pytest.raises(ValueError):
+        LowPassFilter(fft_backend="unknown")
+
+    with pytest.raises(ValueError):
+        get_fft_backend("unknown")
+
+
+def test_default_backend_from_environment(monkeypatch):
+    pytest.importorskip("scipy")
+    monkeypatch.setattr(fft, "FFT_BACKEND", "scipy")
+    monkeypatch.setattr(fft, "FFT_WORKERS", 3)
+
+    backend = LowPassFilter().fft
+    assert backend.name == "scipy" and backend.workers == 3
+
+    # explicit choices take precedence
+    assert LowPassFilter(fft_backend="numpy").fft.name == "numpy"
+
+
+@pytest.mark.parametrize("backend_name", ["scipy", "pyfftw"])
+@pytest.mark.parametrize("precision", ["float32", "float64"])
+def test_backends_match_numpy(face_image_data: np.ndarray, backend_name: str, precision: str):
+    pytest.importorskip(backend_name)
+
+    for filter_class in [LowPassFilter, HighPassFilter]:
+        image_filter = filter_class(0.002, precision=precision, fft_backend=backend_name, fft_workers=2)
+        assert image_filter.fft.name == backend_name
+
+        expected = filter_class(0.002, precision=precision).filter(face_image_data)
+        assert np.allclose(image_filter.filter(face_image_data), expected, atol=1e-2)
+        assert np.allclose(image_filter.filter_tiled(face_image_data, (100, 100)), expected, atol=1)
+
+
+def test_unavailable_backend_falls_back_to_numpy():
+    class MissingFFTBackend(NumpyFFTBackend):
+        name = "missing"
+
+        def __init__(self, workers=None):
+            raise ImportError("No module named 'missing'")
+
+    register_fft_backend(MissingFFTBackend)
+
+    try:
+        with pytest.warns(UserWarning):
+            image_filter = LowPassFilter(fft_backend="missing")
+            assert isinstance(image_filter.fft, NumpyFFTBackend)
+    finally:
+        unregister_fft_backend("missing")
+
+    # the numpy fallback created for "missing" must not outlive the test
+    assert "missing" not in fft.fft_backends
+    assert fft._create_fft_backend.cache_info().currsize == 0
+
+
+def test_pyfftw_wisdom_is_persisted(tmp_path):
+    pytest.importorskip("pyfftw")
+
+    backend = fft.PyFFTWBackend(workers=1, wisdom_path=tmp_path / "wisdom.pickle")
+    backend.irfft2(backend.rfft2(np.random.rand(64, 64)), (64, 64))
+    backend.save_wisdom()
+
+    assert (tmp_path / "wisdom.pickle").stat().st_size > 0
@@ -0,0 +1,65 @@
+import gc
+import weakref
+
+import numpy as np
+import pytest
+
+from hybrid_face.filters import KernelCache, LowPassFilter, kernel_cache
+
+
+def test_cache_hits_and_misses():
+    cache = KernelCache(max_bytes=10 ** 6)
+    first = cache.get("a", lambda: np.ones(10))
+    second = cache.get("a", lambda: np.zeros(10))
+
+    assert first is second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["bytes"] == first.nbytes
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = KernelCache(max_bytes=250)
+    for key in range(5):
+        cache.get(key, lambda: np.ones(10))  # 80 bytes each
+
+    # only the three most recent kernels fit into the budget
+    assert len(cache) == 3
+    assert cache.stats()["bytes"] <= 250
+    assert cache.stats()["evictions"] == 2
+
+    # shrinking the budget evicts immediately
+    cache.max_bytes = 100
+    assert len(cache) == 1
+
+    # kernels larger than the budget are returned but not cached
+    cache.get("large", lambda: np.ones(100))
+    assert len(cache) == 1
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_cached_kernels_are_read_only():
+    cache = KernelCache()
+    kernel = cache.get("a", lambda: np.ones(10))
+
+    with pytest.raises(ValueError):
+        kernel[0] = 0
+
+
+def test_cache_is_shared_between_instances():
+    kernel_cache.clear()
+    kernel = LowPassFilter(0.01).get_kernel((20, 30))
+
+    assert LowPassFilter(0.01).get_kernel((20, 30)) is kernel
+    assert LowPassFilter(0.02).get_kernel((20, 30)) is not kernel
+
+
+def test_cache_does_not_keep_filters_alive():
+    low_pass_filter = LowPassFilter(0.01)
+    low_pass_filter.filter(np.ones((10, 10)))
+
+    filter_reference = weakref.ref(low_pass_filter)
+    del low_pass_filter
+    gc.collect()
+
+    assert filter_reference() is None
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from hybrid_face.cli import main
+from hybrid_face.filters import (
+    HighPassFilter,
+    KernelStore,
+    LowPassFilter,
+    kernel_cache,
+    kernel_store,
+)
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    # use a fresh store and make sure no kernel comes from memory
+    monkeypatch.setattr(kernel_store, "path", tmp_path)
+    monkeypatch.setattr(kernel_store, "read_only", True)
+    kernel_cache.clear()
+    yield tmp_path
+    kernel_cache.clear()
+
+
+def test_store_round_trip(tmp_path):
+    store = KernelStore(tmp_path, read_only=False)
+    kernel, factors = np.arange(6.0).reshape(2, 3), (np.ones(3, dtype=np.float32), np.arange(4.0))
+
+    assert store.get(("dense", 0.5, (2, 3)), lambda: kernel) is kernel
+    assert store.get(("factors", 0.5, (2, 3)), lambda: factors) is factors
+    assert store.misses == 2
+
+    loaded_kernel = store.get(("dense", 0.5, (2, 3)), lambda: None)
+    loaded_factors = store.get(("factors", 0.5, (2, 3)), lambda: None)
+
+    assert store.hits == 2
+    assert isinstance(loaded_kernel, np.memmap) and not loaded_kernel.flags.writeable
+    assert np.array_equal(loaded_kernel, kernel)
+    assert all(np.array_equal(a, b) and a.dtype == b.dtype for a, b in zip(loaded_factors, factors))
+
+
+def test_read_only_store_is_not_written(tmp_path):
+    store = KernelStore(tmp_path)
+    store.get("kernel", lambda: np.ones(3))
+
+    assert store.load("kernel") is None
+    assert not any(tmp_path.iterdir())
+
+
+def test_filters_use_stored_kernels(store_path, face_image_data: np.ndarray):
+    results = [image_filter.filter(face_image_data) for image_filter in (LowPassFilter(0.002), HighPassFilter(0.002))]
+    assert not any(store_path.iterdir())
+
+    assert main(["warmup", str(store_path), "--sizes", "462x462", "--emphasis", "balanced"]) is None
+    kernel_cache.clear()
+
+    for image_filter, result in zip((LowPassFilter(0.002), HighPassFilter(0.002)), results):
+        assert np.array_equal(image_filter.filter(face_image_data), result)
+
+        # the kernel factors were memory-mapped rather than computed
+        padded_shape = image_filter.get_padded_shape(face_image_data.shape)
+        assert all(isinstance(factor, np.memmap) for factor in image_filter.get_kernel_factors(padded_shape))
+
+
+def test_corrupt_kernels_are_ignored(tmp_path):
+    (tmp_path / "broken.npy").write_bytes(b"not a kernel")
+
+    assert KernelStore(tmp_path).get("broken", lambda: np.ones(3)).sum() == 3
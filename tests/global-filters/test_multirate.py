@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from hybrid_face.cli import sigma_dict
+from hybrid_face.filters import HighPassFilter, LowPassFilter
+from hybrid_face.filters.multirate import decimate, interpolate, resampling_variance
+
+
+def psnr(image_data: np.ndarray, reference_data: np.ndarray) -> float:
+    return 10 * np.log10(255 ** 2 / np.mean((image_data - reference_data) ** 2))
+
+
+@pytest.mark.parametrize("factor", [1, 2, 3, 5])
+def test_resampling_preserves_constants(factor: int):
+    image_data = np.full((2, 47, 30), 7.0)
+    decimated_data = decimate(image_data, factor)
+
+    assert decimated_data.shape == (2, -(-47 // factor), -(-30 // factor))
+
+    # blocks reaching over the border average in the zeros outside of the image
+    assert np.allclose(decimated_data[:, : 47 // factor, : 30 // factor], 7)
+    assert np.allclose(interpolate(np.full(decimated_data.shape, 7.0), (47, 30), factor), 7)
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("emphasis", list(sigma_dict))
+def test_multirate_engine_matches_fft(face_image_data: np.ndarray, filter_class, emphasis: str):
+    sigma = sigma_dict[emphasis]
+    multirate_filter = filter_class(sigma, engine="multirate")
+    assert multirate_filter.choose_engine(face_image_data.shape) == "multirate"
+    assert multirate_filter.decimation_factor() > 1
+
+    exact_data = filter_class(sigma).filter(face_image_data)
+    multirate_data = multirate_filter.filter(face_image_data)
+
+    # both are zero outside of the image, but the interpolation cannot reproduce the steep edge there
+    margin = multirate_filter.spatial_support()
+    assert psnr(multirate_data, exact_data) > 30
+    assert psnr(multirate_data[margin:-margin, margin:-margin], exact_data[margin:-margin, margin:-margin]) > 50
+
+
+def test_multirate_engine_falls_back_to_fft():
+    # the kernel of wide filters reaches up to the nyquist frequency, they cannot be decimated
+    image_filter = LowPassFilter(0.25, engine="multirate")
+
+    assert image_filter.decimation_factor() == 1
+    assert image_filter.choose_engine((100, 100)) == "fft"
+
+
+def test_small_truncation_leaves_a_kernel_to_apply(face_image_data: np.ndarray, monkeypatch):
+    # with truncate 1.5, sigma 0.0005 would allow D = 29, whose resampling alone blurs more than the kernel
+    monkeypatch.setattr(LowPassFilter, "truncate", 1.5)
+    image_filter = LowPassFilter(0.0005, engine="multirate")
+
+    factor = image_filter.decimation_factor()
+    assert 1 < factor < 29
+    assert resampling_variance(factor) < image_filter.spatial_std() ** 2
+
+    multirate_data = image_filter.filter(face_image_data)
+    exact_data = LowPassFilter(0.0005).filter(face_image_data)
+    assert psnr(multirate_data, exact_data) > 30
+
+
+def test_multirate_filter_batch(face_image_data: np.ndarray):
+    image_filter = HighPassFilter(0.002, engine="multirate")
+    images = np.stack([face_image_data, face_image_data.T])
+
+    filtered_images = image_filter.filter_batch(images)
+    assert np.allclose(filtered_images[1], image_filter.filter(face_image_data.T))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from hybrid_face.filters import Filter, HighPassFilter, LowPassFilter
+
+
+def to_8_bit(image_data: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(image_data), 0, 255).astype(int)
+
+
+def test_invalid_precision():
+    with pytest.raises(ValueError):
+        LowPassFilter(precision="float16")
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("engine", ["fft", "direct", "pyramid"])
+@pytest.mark.parametrize("padding", Filter.padding_modes)
+def test_single_precision_matches_double_precision(face_image_data: np.ndarray, filter_class, engine, padding):
+    for sigma in [0.0005, 0.002, 0.005, 0.25]:
+        double_filter = filter_class(sigma, padding=padding, engine=engine)
+        single_filter = filter_class(sigma, padding=padding, engine=engine, precision="float32")
+
+        # 8-bit outputs differ by at most one grey level (values right at rounding boundaries)
+        image_data = face_image_data.astype(np.uint8)
+        difference = to_8_bit(single_filter.filter(image_data)) - to_8_bit(double_filter.filter(image_data))
+        assert np.abs(difference).max() <= 1
+
+
+def test_single_precision_kernels(global_filter: Filter, image_shape):
+    single_filter = global_filter.with_sigma(global_filter.sigma)
+    single_filter.precision = "float32"
+    padded_shape = global_filter.get_padded_shape(image_shape)
+
+    # kernels of both precisions are cached separately, single precision ones take half the memory
+    single_kernel = single_filter.get_grid_kernel(padded_shape, half_plane=True)
+    double_kernel = global_filter.get_grid_kernel(padded_shape, half_plane=True)
+    assert single_kernel.dtype == np.float32 and double_kernel.dtype == np.float64
+    assert 2 * single_kernel.nbytes == double_kernel.nbytes
+
+    assert all(factor.dtype == np.float32 for factor in single_filter.get_kernel_factors(padded_shape))
+
+
+def test_single_precision_pipeline(face_image_data: np.ndarray):
+    single_filter = HighPassFilter(precision="float32")
+
+    # numpy < 2 always computes ffts in double precision
+    if np.lib.NumpyVersion(np.__version__) >= "2.0.0":
+        assert single_filter.transform(face_image_data).dtype == np.complex64
+        assert single_filter.filter(face_image_data).dtype == np.float32
+
+    assert single_filter.filter_direct(face_image_data).dtype == np.float32
+    assert single_filter.filter_pyramid(face_image_data).dtype == np.float32
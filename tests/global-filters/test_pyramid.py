@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from hybrid_face.filters import Filter, HighPassFilter, LowPassFilter
+from hybrid_face.filters.pyramid import (
+    collapse,
+    expand,
+    laplacian_pyramid,
+    pyramid_low_pass,
+    reduce,
+)
+
+
+def test_reduce_and_expand_shapes(image_shape):
+    image_data = np.random.rand(*image_shape)
+    reduced_data = reduce(image_data)
+
+    n, m = image_shape
+    assert reduced_data.shape == ((n + 1) // 2, (m + 1) // 2)
+    assert expand(reduced_data, image_shape).shape == image_shape
+
+
+def test_laplacian_pyramid_is_invertible(random_image_data: np.ndarray):
+    pyramid = laplacian_pyramid(random_image_data, 4)
+
+    assert len(pyramid) == 5
+    assert np.allclose(collapse(pyramid), random_image_data)
+
+
+@pytest.mark.parametrize("spatial_std", [0.5, 1.5, 4.5, 7.1, 14.2])
+def test_pyramid_low_pass_matches_blur(spatial_std: float):
+    impulse = np.zeros((512, 512))
+    impulse[256, 256] = 1
+
+    # the impulse response has the wanted variance and preserves brightness
+    response = pyramid_low_pass(impulse, spatial_std).sum(axis=1)
+    rows = np.arange(len(response))
+    mean = (response * rows).sum()
+
+    assert np.isclose(response.sum(), 1)
+    assert np.isclose(np.sqrt((response * (rows - mean) ** 2).sum()), spatial_std, rtol=0.01)
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("sigma", [0.0005, 0.002, 0.005])
+def test_pyramid_engine_matches_fft(face_image_data: np.ndarray, filter_class, sigma: float):
+    pyramid_filter = filter_class(sigma, engine="pyramid")
+    assert pyramid_filter.choose_engine(face_image_data.shape) == "pyramid"
+
+    filtered_data = pyramid_filter.filter(face_image_data)
+    expected = filter_class(sigma).filter(face_image_data)
+
+    # borders are reflected rather than zero-padded, so compare away from them
+    margin = pyramid_filter.spatial_support()
+    error = np.abs(filtered_data - expected)[margin:-margin, margin:-margin]
+    assert error.mean() < 1 and error.max() < 5
+
+    assert np.allclose(pyramid_filter.filter_batch(face_image_data[None])[0], filtered_data)
+
+
+def test_pyramid_engine_works_on_tiny_images(global_filter: Filter, random_image_data: np.ndarray):
+    pyramid_filter = global_filter.with_sigma(global_filter.sigma)
+    pyramid_filter.engine = "pyramid"
+
+    filtered_data = pyramid_filter.filter(random_image_data)
+    assert filtered_data.shape == random_image_data.shape
+    assert np.isfinite(filtered_data).all()
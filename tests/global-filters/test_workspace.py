@@ -0,0 +1,107 @@
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from hybrid_face.filters import HighPassFilter, LowPassFilter, WorkspacePool, fft
+
+
+def test_pool_reuses_workspaces():
+    pool = WorkspacePool(max_bytes=10 ** 6)
+    first = pool.get((10, 20))
+
+    assert pool.get((10, 20)) is first
+    assert pool.get((10, 20), np.float32) is not first
+    assert first.fft_data.shape == (10, 11) and first.fft_data.dtype == np.complex128
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 2
+
+
+def test_pool_is_bounded_by_bytes():
+    pool = WorkspacePool(max_bytes=10 ** 4)
+    for length in range(10, 15):
+        pool.get((length, length))
+
+    assert pool.stats()["bytes"] <= 10 ** 4
+    assert pool.stats()["evictions"] > 0
+
+    # workspaces larger than the budget are returned but not kept
+    assert pool.get((100, 100)).padded_data.shape == (100, 100)
+    assert len(pool) == 0
+
+
+def test_pool_is_thread_local():
+    pool = WorkspacePool()
+    workspaces = []
+
+    def get_workspace():
+        workspaces.append(pool.get((10, 10)))
+
+    threads = [threading.Thread(target=get_workspace) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert workspaces[0] is not workspaces[1]
+
+
+def test_workspace_load_clears_padding():
+    workspace = WorkspacePool().get((8, 8))
+    workspace.padded_data.fill(1)
+
+    padded_data = workspace.load(np.full((4, 5), 2, dtype=np.uint8))
+
+    assert padded_data.sum() == 2 * 4 * 5
+
+
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+@pytest.mark.parametrize("precision", ["float32", "float64"])
+def test_workspace_results_do_not_change(face_image_data: np.ndarray, filter_class, precision: str):
+    image_filter = filter_class(0.002, precision=precision)
+    images = [face_image_data, face_image_data[:400, :300]]
+    results = [image_filter.filter(image_data) for image_data in images]
+
+    # results must not alias the reused buffers
+    image_filter.filter(face_image_data[::-1])
+    assert np.array_equal(results[0], image_filter.filter(face_image_data))
+
+    # same as the transforms without workspace, which allocate their own buffers
+    for image_data, result in zip(images, results):
+        padded_shape = image_filter.get_padded_shape(image_data.shape)
+        fft_data = image_filter.transform(image_data, padded_shape, workspace=None)
+        image_filter.apply_kernel(fft_data, padded_shape)
+        expected = image_filter.inverse_transform(fft_data, image_data.shape, padded_shape, workspace=None)
+
+        assert np.allclose(result, expected, atol=1e-3)
+
+
+def test_filter_batch_output(face_image_data: np.ndarray):
+    image_filter = HighPassFilter(0.002)
+    images = np.stack([face_image_data, face_image_data[::-1]])
+    out = np.empty_like(images)
+
+    assert image_filter.filter_batch(images, out=out) is out
+    assert np.allclose(out[1], image_filter.filter(face_image_data[::-1]))
+
+    with pytest.raises(ValueError):
+        image_filter.filter_batch(images, out=out[:1])
+
+
+@pytest.mark.skipif(not fft.NUMPY_FFT_OUT, reason="numpy's transforms accept output buffers since numpy 2.0")
+@pytest.mark.parametrize("filter_class", [LowPassFilter, HighPassFilter])
+def test_filter_does_not_allocate(face_image_data: np.ndarray, filter_class):
+    image_filter = filter_class(0.002)
+    out = np.empty_like(face_image_data)
+
+    # the first call creates workspace and kernel
+    image_filter.filter(face_image_data, out=out)
+
+    tracemalloc.start()
+    image_filter.filter(face_image_data, out=out)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # the padded image alone would take four times the image
+    assert peak < face_image_data.nbytes / 10
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from hybrid_face.async_api import (
+    AsyncRunner,
+    StepExecutor,
+    filter_async,
+    hybrid_merge_async,
+)
+from hybrid_face.filters import FaceFilter, LowPassFilter
+from hybrid_face.hybrid_merge import hybrid_merge
+
+face_files = sorted(Path("tests/images/faces/").iterdir())[:2]
+
+
+def open_faces():
+    return [Image.open(face_file) for face_file in face_files]
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_hybrid_merge_async_matches_hybrid_merge(concurrent):
+    expected = hybrid_merge(*open_faces(), concurrent=concurrent)
+    result = asyncio.run(hybrid_merge_async(*open_faces(), concurrent=concurrent))
+
+    np.testing.assert_array_equal(np.asarray(result), np.asarray(expected))
+
+
+def test_filter_async_matches_filter():
+    image_data = np.random.randint(0, 256, (100, 80))
+    image_filter = LowPassFilter(0.01)
+
+    np.testing.assert_array_equal(asyncio.run(filter_async(image_filter, image_data)), image_filter.filter(image_data))
+
+
+class CountingTask:
+    """Blocking task recording how many of its calls run at once."""
+
+    def __init__(self, seconds: float = 0.05):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def __call__(self):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running -= 1
+
+
+def test_max_concurrency():
+    runner = AsyncRunner(ThreadPoolExecutor(8), max_concurrency=2)
+    task = CountingTask()
+
+    async def run_all():
+        await asyncio.gather(*(runner.run(task) for _ in range(6)))
+
+    # semaphores must work across event loops as well
+    asyncio.run(run_all())
+    asyncio.run(run_all())
+    assert task.max_running == 2
+
+
+def test_cancelled_calls_keep_their_slot():
+    runner = AsyncRunner(ThreadPoolExecutor(8), max_concurrency=1)
+    task = CountingTask()
+
+    async def cancel_under_load():
+        calls = [asyncio.ensure_future(runner.run(task)) for _ in range(5)]
+        for _ in range(4):
+            # cancel whichever call is running at the moment
+            await asyncio.sleep(0.01)
+            calls.pop(0).cancel()
+
+        await calls[0]
+
+    asyncio.run(cancel_under_load())
+    assert task.max_running == 1
+
+
+def test_invalid_max_concurrency():
+    with pytest.raises(ValueError):
+        AsyncRunner(max_concurrency=0)
+
+
+def test_cancelled_step_executor_refuses_tasks():
+    steps = StepExecutor()
+    assert steps.submit(sum, [1, 2]).result() == 3
+
+    steps.cancel()
+    with pytest.raises(CancelledError):
+        steps.submit(sum, [1, 2])
+
+
+def test_cancellation_stops_merge_between_steps(monkeypatch):
+    detecting, release = threading.Event(), threading.Event()
+    filtered = []
+
+    select_face = FaceFilter.select_face
+
+    def blocking_select_face(self, image, policy):
+        detecting.set()
+        release.wait(5)
+        return select_face(self, image, policy)
+
+    monkeypatch.setattr(FaceFilter, "select_face", blocking_select_face)
+    monkeypatch.setattr(FaceFilter, "filter_image", lambda self, image: filtered.append(image))
+
+    executor = ThreadPoolExecutor(1)
+    runner = AsyncRunner(executor)
+
+    async def cancel_during_detection():
+        task = asyncio.ensure_future(runner.hybrid_merge(*open_faces()))
+        while not detecting.is_set():
+            await asyncio.sleep(0.01)
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_during_detection())
+    release.set()
+    executor.shutdown(wait=True)
+
+    assert filtered == []
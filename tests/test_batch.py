@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from hybrid_face import batch
+from hybrid_face.batch import BatchItem, read_manifest, run_batch
+from hybrid_face.cli import main
+
+
+def test_read_csv_manifest(tmp_path):
+    manifest_path = tmp_path / "manifest.csv"
+    manifest_path.write_text("near,far,emphasis,output\na.png,b.png,far,out/ab.png\nc.png,d.png,,cd.png\n")
+
+    items = read_manifest(manifest_path)
+    assert items == [
+        BatchItem(tmp_path / "a.png", tmp_path / "b.png", tmp_path / "out/ab.png", "far"),
+        BatchItem(tmp_path / "c.png", tmp_path / "d.png", tmp_path / "cd.png", "balanced"),
+    ]
+
+
+def test_read_jsonl_manifest(tmp_path):
+    manifest_path = tmp_path / "manifest.jsonl"
+    rows = [{"near": "a.png", "far": "b.png", "output": "ab.png", "emphasis": "near"}]
+    manifest_path.write_text("\n".join(json.dumps(row) for row in rows))
+
+    assert read_manifest(manifest_path) == [
+        BatchItem(tmp_path / "a.png", tmp_path / "b.png", tmp_path / "ab.png", "near")
+    ]
+
+
+def test_invalid_manifest(tmp_path):
+    manifest_path = tmp_path / "manifest.csv"
+    manifest_path.write_text("near,far\na.png,b.png\n")
+
+    with pytest.raises(ValueError):
+        read_manifest(manifest_path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failures_do_not_abort_the_batch(tmp_path, workers):
+    items = [BatchItem(tmp_path / "missing.png", tmp_path / "missing.png", tmp_path / f"{i}.png") for i in range(3)]
+    results = run_batch(items, workers=workers)
+
+    assert [result.item for result in results] == items
+    assert all("FileNotFoundError" in result.error for result in results)
+
+
+def crashing_process_item(item, merge_kwargs=None):
+    # simulates a worker killed mid-item, e.g. by a segfault in dlib or the OOM killer
+    os._exit(1)
+
+
+def test_crashed_workers_do_not_abort_the_batch(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(batch, "process_item", crashing_process_item)
+
+    items = [BatchItem(tmp_path / "a.png", tmp_path / "b.png", tmp_path / f"{i}.png") for i in range(3)]
+    results = run_batch(items, workers=2)
+
+    assert [result.item for result in results] == items
+    assert all("BrokenProcessPool" in result.error for result in results)
+    assert "Processed 3 items (3 failed)" in capsys.readouterr().out
+
+
+def test_batch_subcommand_exit_code(tmp_path):
+    manifest_path = tmp_path / "manifest.csv"
+    manifest_path.write_text("near,far,output\nmissing.png,missing.png,out.png\n")
+
+    assert main(["batch", str(manifest_path), "--workers", "1"]) == 1
+
+
+def test_batch_subcommand_forwards_detector(tmp_path, monkeypatch):
+    manifest_path = tmp_path / "manifest.csv"
+    manifest_path.write_text("near,far,output\na.png,b.png,out.png\n")
+
+    calls = []
+
+    def run_batch(items, workers, merge_kwargs, *args):
+        calls.append(merge_kwargs)
+        return []
+
+    monkeypatch.setattr(batch, "run_batch", run_batch)
+
+    assert main(["batch", str(manifest_path), "--detector", "cnn"]) == 0
+    assert calls[0]["detector"] == "cnn"
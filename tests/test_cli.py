@@ -0,0 +1,29 @@
+import pytest
+
+from hybrid_face.cli import parse_args, parse_batch_args
+from hybrid_face.filters import Filter, fft
+
+
+@pytest.mark.parametrize("engine", Filter.engines)
+def test_engine_choices(engine):
+    assert parse_args(["-n", "near.png", "-f", "far.png", "--engine", engine]).engine == engine
+    assert parse_batch_args(["manifest.csv", "--engine", engine]).engine == engine
+
+
+def test_registered_fft_backends_can_be_chosen(monkeypatch):
+    # backends registered at runtime (see `register_fft_backend`) are offered as well
+    monkeypatch.setitem(fft.fft_backends, "custom", fft.NumpyFFTBackend)
+
+    assert parse_args(["-n", "near.png", "-f", "far.png", "--fft-backend", "custom"]).fft_backend == "custom"
+    assert parse_batch_args(["manifest.csv", "--fft-backend", "custom"]).fft_backend == "custom"
+
+
+def test_shared_options():
+    options = ["--face-policy", "pair", "--max-working-size", "800", "--kernel-store", "kernels", "--fft-workers", "2"]
+    options += ["--detector", "cnn"]
+    single_args = parse_args(["-n", "near.png", "-f", "far.png", *options])
+    batch_args = parse_batch_args(["manifest.csv", *options])
+
+    for args in (single_args, batch_args):
+        assert (args.face_policy, args.max_working_size, args.fft_workers, args.detector) == ("pair", 800, 2, "cnn")
+        assert str(args.kernel_store_path) == "kernels"
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+import time
+
+# generous upper bound, loading dlib and the face_recognition models alone takes longer than that
+MAX_STARTUP_SECONDS = 3.0
+
+
+def run_python(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def test_importing_filters_does_not_load_face_recognition():
+    code = "import sys, hybrid_face.filters; assert 'face_recognition' not in sys.modules"
+    assert run_python(code) < MAX_STARTUP_SECONDS
+
+
+def test_cli_version_is_fast():
+    code = "\n".join(
+        [
+            "import sys",
+            "from hybrid_face import cli",
+            "try:",
+            "    cli.main(['--version'])",
+            "except SystemExit:",
+            "    pass",
+            "assert 'face_recognition' not in sys.modules",
+        ]
+    )
+    assert run_python(code) < MAX_STARTUP_SECONDS